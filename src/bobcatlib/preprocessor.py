@@ -20,11 +20,35 @@ preprocessed text, so that in case of parsing errors the user can be told where
 exactly the error occured in the source document.
 
 It achieves this by one fat unicode-like data type called `Excerpt`.
+
+:var compiled_patterns: all regular expressions of substitutions compiled so
+  far, see `compile_pattern`.
+:var replacement_characters: all replacement characters of substitutions read
+  so far, mapped to themselves.  It is used to share one string object for
+  every replacement character among all input methods.
+:var prepared_substitutions: the sorted and compiled pre and post
+  substitutions of all input method combinations used so far in
+  `process_text`.  The key contains `input_methods_path` and the names of
+  the input methods in their given order, since the order is significant.
+
+:type compiled_patterns: dict mapping unicode to re.pattern (or regex.pattern)
+:type replacement_characters: dict mapping unicode to unicode
+:type prepared_substitutions: dict mapping (str, tuple of str) to (list, list)
 """
 
-import re, os.path, codecs, string, warnings
+import re, os.path, io, string, warnings, bisect, array, itertools
 from . import common
 from .common import FileError, EncodingError, PositionMarker
+try:
+    # The third-party regex module is API-compatible with re but usually
+    # matches faster.  It is only used for the patterns of substitutions.
+    import regex as substitutions_re
+except ImportError:
+    substitutions_re = re
+
+# Whitespace as understood by the preprocessor.  Testing membership in a
+# frozenset is faster than in the string ``string.whitespace``.
+whitespace_characters = frozenset(string.whitespace)
 
 class Excerpt(unicode):
     """Class for preprocessed Bobcat source text. It behaves like a unicode string
@@ -50,7 +74,24 @@ class Excerpt(unicode):
 
     :cvar entity_pattern: Regexp pattern for numerical entities like
       ``\\0x0207;`` or ``\\#8022;``.
+    :cvar comment_line_pattern: Regexp pattern for comment lines in Bobcat
+      source text.
+    :cvar ordinary_characters_pattern: Regexp pattern for a run of characters
+      which have no special meaning in the preprocessor, so that they can be
+      copied to the preprocessed text as they are.  Whitespace other than line
+      breaks is included because it is special only after a backslash.
+    :cvar analysed_substitutions: cache for `analyse_substitutions`, mapping
+      tuples of substitution patterns to its results.
+    :cvar entities: cache for numerical entities decoded so far, mapping the
+      matched entity (without the backslash) to its character.
+    :cvar split_patterns: cache for the patterns used in `split`, mapping the
+      split characters to the pattern.
     :type entity_pattern: re.pattern
+    :type comment_line_pattern: re.pattern
+    :type ordinary_characters_pattern: re.pattern
+    :type analysed_substitutions: dict mapping tuple of re.pattern to tuple
+    :type entities: dict mapping unicode to unicode
+    :type split_patterns: dict mapping unicode to re.pattern
 
     :ivar escaped_positions: the indices of all characters in the Excerpt which
       were escaped in the original input.  Note that this is a set which is not
@@ -71,6 +112,12 @@ class Excerpt(unicode):
     :ivar __escaped_text: the unicode equivalent of the Excerpt, with all
       escaped characters and characters of code snippets replaced with NULL
       characters.  It is a cache used in `escaped_text`.
+    :ivar __sorted_positions: the keys of `original_positions` in ascending
+      order.  It is a cache used in `sorted_positions`, so it must be reset to
+      ``None`` whenever `original_positions` is changed after it was used.
+    :ivar __sorted_escaped_positions: `escaped_positions` in ascending order.
+      It is a cache used in `sorted_escaped_positions`, so it must be reset to
+      ``None`` whenever `escaped_positions` is changed after it was used.
 
     :type escaped_positions: set of int
     :type code_snippets_intervals: list of (int, int)
@@ -78,6 +125,8 @@ class Excerpt(unicode):
     :type original_text: unicode
     :type __post_substitutions: list of (re.pattern, unicode)
     :type __escaped_text: unicode
+    :type __sorted_positions: list of int
+    :type __sorted_escaped_positions: list of int
     """
     # FixMe: The following pylint directive is necessary because astng doesn't
     # parse attribute settings in the __new__ classmethod.  If this changes or
@@ -87,8 +136,13 @@ class Excerpt(unicode):
     # pylint: disable-msg=E1101
     entity_pattern = re.compile(r"((0x(?P<hex>[0-9a-fA-F]+))|(#(?P<dec>[0-9]+)));")
     whitespace_pattern = re.compile(r"(\A\s+)|(\s+\Z)|(\s{2,})|([\t\n\r\f\v])")
+    comment_line_pattern = re.compile(r"^\.\.( .*)?$", re.MULTILINE)
+    ordinary_characters_pattern = re.compile(r"[^\n\r\\\[\]`]*")
+    analysed_substitutions = {}
+    entities = {}
+    split_patterns = {}
     @classmethod
-    def get_next_match(cls, original_text, substitutions, offset=0):
+    def get_next_match(cls, original_text, substitutions, offset=0, candidates=None):
         """Return the next input method match in `original_text`.  The search
         starts at `offset`.
 
@@ -96,10 +150,17 @@ class Excerpt(unicode):
           - `original_text`: the original line in the Bobcat input file
           - `substitutions`: the substitution dictionary to be used
           - `offset`: starting position for the search in original_text
+          - `candidates`: iterator over the matches of the fused pattern in
+            `original_text`, see `analyse_substitutions`.  If given, it is consumed
+            up to the found match, so that it can be re-used for the next
+            search with a greater `offset`.
 
         :type original_text: unicode
-        :type substitutions: list with the (match, replacement) tuples
+        :type substitutions: list with the (match, replacement) tuples.  The
+          replacement may also be a translation table mapping character codes
+          to replacements.
         :type offset: int
+        :type candidates: iterator over re.match
 
         :Return:
           the position of the found match, the length of the match, and the
@@ -108,26 +169,105 @@ class Excerpt(unicode):
 
         :rtype: int, int, unicode
         """
-        earliest_match_position = len(original_text)
-        longest_match_length = 0
-        best_match = None
-        for substitution in substitutions:
-            match = substitution[0].search(original_text, offset)
-            if match and match.group().count("\r") + match.group().count("\n") == 0:
-                start, end = match.span()
-                if start == earliest_match_position:
-                    if end - start > longest_match_length:
-                        longest_match_length = end - start
-                        best_match = match
-                        replacement = substitution[1]
-                elif start < earliest_match_position:
-                    earliest_match_position = start
-                    longest_match_length = end - start
-                    best_match = match
-                    replacement = substitution[1]
-        if not best_match or not best_match.group():
+        if not substitutions:
+            return len(original_text), 0, None
+        fused_pattern, literals, literal_lengths, regex_indices = cls.analyse_substitutions(substitutions)
+        if candidates is None:
+            candidates = fused_pattern.finditer(original_text, offset)
+        # Substitutions whose first match contains a line break are not used
+        # at all.
+        discarded_substitutions = set()
+        for candidate in candidates:
+            position = candidate.start()
+            if position < offset:
+                continue
+            # The longest match wins; of equally long matches, the one which
+            # comes first in `substitutions`.
+            best_index = None
+            longest_match_length = 0
+            for length in literal_lengths:
+                if position + length > len(original_text):
+                    continue
+                i = literals.get(original_text[position:position+length])
+                if i is not None:
+                    best_index, longest_match_length = i, length
+                    break
+            for i in regex_indices:
+                if i in discarded_substitutions:
+                    continue
+                match = substitutions[i][0].match(original_text, position)
+                if match:
+                    match_length = match.end() - position
+                    if "\r" in match.group() or "\n" in match.group():
+                        discarded_substitutions.add(i)
+                    elif best_index is None or match_length > longest_match_length or \
+                            match_length == longest_match_length and i < best_index:
+                        best_index, longest_match_length = i, match_length
+            if best_index is not None:
+                break
+        else:
+            return len(original_text), 0, None
+        if not longest_match_length:
             return len(original_text), 0, None
-        return best_match.start(), best_match.end() - best_match.start(), replacement
+        replacement = substitutions[best_index][1]
+        if isinstance(replacement, dict):
+            # Combined single-character substitutions, see `process_text`
+            replacement = original_text[position:position+longest_match_length].translate(replacement)
+        return position, longest_match_length, replacement
+    @classmethod
+    def analyse_substitutions(cls, substitutions):
+        """Prepare a substitution list for fast matching.  The result is
+        cached in `analysed_substitutions`.
+
+        First, this returns one pattern which matches (with zero length) at
+        every position at which one of the substitutions matches.  It is a
+        lookahead of the alternation of all substitution patterns, so that
+        ``finditer`` yields all candidate positions in one left-to-right scan,
+        even if the matches of the substitutions overlap.  Only at those
+        positions, the substitutions are tried in order to find the longest
+        match.
+
+        Secondly, substitutions which match only a literal string are
+        separated from the others.  In the fused pattern, all literals are
+        combined into one trie-shaped alternation, see `trie_pattern`.  At a
+        candidate position, they are looked up in a dictionary rather than
+        matched one by one.
+
+        :Parameters:
+          - `substitutions`: the substitution list, see `get_next_match`
+
+        :type substitutions: list with the (match, replacement) tuples
+
+        :Return:
+          the fused pattern, a dictionary mapping literals to the index of
+          their first substitution, the lengths of all literals in descending
+          order, and the indices of all other substitutions
+
+        :rtype: re.pattern, dict mapping unicode to int, list of int, list of
+          int
+        """
+        key = tuple(pattern for pattern, __ in substitutions)
+        try:
+            return cls.analysed_substitutions[key]
+        except KeyError:
+            pass
+        literals = {}
+        regex_indices = []
+        alternatives = []
+        for i, pattern in enumerate(key):
+            literal = literal_text(pattern.pattern)
+            if literal and "\r" not in literal and "\n" not in literal:
+                literals.setdefault(literal, i)
+            else:
+                regex_indices.append(i)
+                alternatives.append(u"(?:%s)" % pattern.pattern)
+        if literals:
+            alternatives.insert(0, trie_pattern(literals))
+        literal_lengths = sorted(set(len(literal) for literal in literals), reverse=True)
+        analysed_substitutions = cls.analysed_substitutions[key] = \
+            compile_pattern(u"(?=" + u"|".join(alternatives) + u")"), literals, literal_lengths, \
+            regex_indices
+        return analysed_substitutions
     def is_escaped(self, position):
         """Return True, if the character at position is escaped.
 
@@ -143,11 +283,40 @@ class Excerpt(unicode):
 
         :rtype: boolean
         """
+        # This is equivalent to looking for NULL characters in
+        # `escaped_text`, but it doesn't need to build it.
         if isinstance(position, (list, tuple)):
-            part = self.escaped_text()[position[0]:position[1]]
+            start, end, __ = slice(position[0], position[1]).indices(len(self))
+            sorted_escaped_positions = self.sorted_escaped_positions()
+            i = bisect.bisect_left(sorted_escaped_positions, start)
+            return (i < len(sorted_escaped_positions) and sorted_escaped_positions[i] < end) or \
+                any(max(start, snippet_start) < min(end, snippet_end)
+                    for snippet_start, snippet_end in self.code_snippets_intervals)
         else:
-            part = self.escaped_text()[position]
-        return u"\u0000" in part
+            if position < 0:
+                position += len(self)
+            if not 0 <= position < len(self):
+                raise IndexError("Excerpt index out of range")
+            return position in self.escaped_positions or self.in_code_snippet(position)
+    def in_code_snippet(self, position):
+        """Return True, if the character at position belongs to a code
+        snippet.
+
+        :Parameters:
+          - `position`: the position in the Excerpt
+
+        :type position: int
+
+        :Return:
+          whether or not the character at `position` lies within one of the
+          `code_snippets_intervals`
+
+        :rtype: boolean
+        """
+        # Since the intervals are sorted, the only candidate is the last
+        # interval starting at or before `position`.
+        i = bisect.bisect_left(self.code_snippets_intervals, (position + 1,)) - 1
+        return i >= 0 and position < self.code_snippets_intervals[i][1]
     def escaped_text(self):
         """Returns the unicode representation of the Excerpt with all escaped
         characters replaced with Null characters.
@@ -160,13 +329,40 @@ class Excerpt(unicode):
         """
         # pylint: disable-msg=E0203, W0201
         if self.__escaped_text is None:
-            text = list(unicode(self))
+            # A unicode array is mutable like a list but doesn't need one
+            # string object per character.
+            text = array.array("u", unicode(self))
             for pos in self.escaped_positions:
                 text[pos] = u"\u0000"
             for start, end in self.code_snippets_intervals:
-                text[start:end] = (end-start) * u"\u0000"
-            self.__escaped_text = u"".join(text)
+                text[start:end] = array.array("u", (end-start) * u"\u0000")
+            self.__escaped_text = text.tounicode()
         return self.__escaped_text
+    def sorted_positions(self):
+        """Returns the indices in the Excerpt for which there are position
+        markers in `original_positions`.
+
+        :Return:
+          the keys of `original_positions` in ascending order
+
+        :rtype: list of int
+        """
+        # pylint: disable-msg=E0203, W0201
+        if self.__sorted_positions is None:
+            self.__sorted_positions = sorted(self.original_positions)
+        return self.__sorted_positions
+    def sorted_escaped_positions(self):
+        """Returns the indices of all escaped characters in the Excerpt.
+
+        :Return:
+          `escaped_positions` in ascending order
+
+        :rtype: list of int
+        """
+        # pylint: disable-msg=E0203, W0201
+        if self.__sorted_escaped_positions is None:
+            self.__sorted_escaped_positions = sorted(self.escaped_positions)
+        return self.__sorted_escaped_positions
     def original_position(self, position=0):
         """Maps a position within the excerpt to the position in the original
         file.
@@ -196,7 +392,8 @@ class Excerpt(unicode):
                         "position in original_position near line %d of file %s" %
                         (position, self.original_positions[0].linenumber,
                          self.original_positions[0].url))
-        closest_position = max([pos for pos in self.original_positions if pos <= position])
+        sorted_positions = self.sorted_positions()
+        closest_position = sorted_positions[bisect.bisect_right(sorted_positions, position) - 1]
         offset = position - closest_position
         closest_marker = self.original_positions[closest_position].transpose(offset)
         closest_marker.column += offset
@@ -220,60 +417,67 @@ class Excerpt(unicode):
         """
         parts = []
         characters = split_characters if split_characters is not None else u" \t\v\n\r"
-        for match in re.finditer(u"[^" + re.escape(characters) + "]*",
-                                 self.escaped_text(), re.UNICODE):
+        escaped_text = self.escaped_text()
+        length = len(escaped_text)
+        try:
+            split_pattern = self.split_patterns[characters]
+        except KeyError:
+            split_pattern = self.split_patterns[characters] = \
+                re.compile(u"[^" + re.escape(characters) + "]*", re.UNICODE)
+        for match in split_pattern.finditer(escaped_text):
             start, end = match.span()
             if start == end:
                 # Match was empty; then it is ignored, unless at the beginning
                 # and the end.
-                if split_characters is None or \
-                        (start != 0 and start != len(self.escaped_text())):
+                if split_characters is None or (start != 0 and start != length):
                     continue
             parts.append(self[start:end])
         return parts
     def normalize_whitespace(self):
         def add_part(result, new_part):
             return result + new_part if result else new_part
-        result = None
         unicode_representation = unicode(self)
-        whitespace_match = self.whitespace_pattern.match(unicode_representation)
-        if whitespace_match:
-            current_position = start = whitespace_match.end()
-        else:
-            current_position = start = 0
-        while current_position < len(unicode_representation):
-            whitespace_match = self.whitespace_pattern.search(unicode_representation, current_position)
-            if whitespace_match:
-                current_position = whitespace_match.end()
-                if whitespace_match.end() == len(unicode_representation):
-                    result = add_part(result, self[start:whitespace_match.start()])
-                    break
-                elif whitespace_match.group().startswith(u" "):
-                    result = add_part(result, self[start:whitespace_match.start()+1])
-                    start = current_position
-                elif whitespace_match.group().endswith(u" "):
-                    result = add_part(result, self[start:whitespace_match.start()])
-                    start = current_position - 1
-                else:
-                    result = add_part(result, self[start:whitespace_match.start()])
-                    result = add_part(result, u" ")
-                    start = current_position
-            else:
-                result = add_part(result, self[start:len(unicode_representation)])
+        length = len(unicode_representation)
+        parts = []
+        start = 0
+        for whitespace_match in self.whitespace_pattern.finditer(unicode_representation):
+            match_start, match_end = whitespace_match.span()
+            if match_start == 0:
+                # Leading whitespace is dropped
+                start = match_end
+            elif match_end == length:
+                # Trailing whitespace is dropped
+                parts.append(self[start:match_start])
+                start = length
                 break
+            elif unicode_representation[match_start] == u" ":
+                parts.append(self[start:match_start+1])
+                start = match_end
+            elif unicode_representation[match_end-1] == u" ":
+                parts.append(self[start:match_start])
+                start = match_end - 1
+            else:
+                parts.append(self[start:match_start])
+                parts.append(u" ")
+                start = match_end
+        if start < length:
+            parts.append(self[start:length])
+        result = None
+        for part in parts:
+            result = add_part(result, part)
         return result or self[:0]
     class Status(object):
-        """A mere container for some immutable data structures used in the pre-
-        and postprocessing.
+        """A mere container for some immutable data structures used in the
+        preprocessing.
 
         The only reason for its existence is that the "nonlocal" statement is
         not yet implemented in Python.  Therefore, I need a mutable data type
         in order to use side effects in the local functions in
-        apply_pre_input_method() and apply_post_input_method().  It's not nice,
-        but the alternatives are even uglier.  BTDT.
+        apply_pre_input_method().  It's not nice, but the alternatives are even
+        uglier.  BTDT.
 
         To sum it up, Status holds (part of) the current status of the
-        pre/postprocessor.
+        preprocessor.
 
         :ivar linenumber: current linenumber in the source file
         :ivar last_linestart: position of the last character that startet a
@@ -286,7 +490,7 @@ class Excerpt(unicode):
         :type linenumber: int
         :type last_linestart: int
         :type position: int
-        :type processed_text: unicode
+        :type processed_text: array.array of unicode characters
         :type in_sourcecode: bool
         """
         def __init__(self):
@@ -319,7 +523,6 @@ class Excerpt(unicode):
 
         :rtype: unicode, dict, list, list
         """
-        comment_line_pattern = re.compile(r"^\.\.( .*)?$", re.MULTILINE)
         # The following functions seem to violate an important programming
         # rule: They modify variables of the outer scope, i.e. the enclosing
         # function (side effects).  However, they are simple to explain and
@@ -338,21 +541,22 @@ class Excerpt(unicode):
             """
             s.position += number_of_characters
             # Now re-sync
-            original_positions[len(s.processed_text)] = \
-                PositionMarker(url, s.linenumber, s.position - s.last_linestart, s.position)
+            original_positions.append((len(s.processed_text),
+                                       PositionMarker(url, s.linenumber, s.position - s.last_linestart,
+                                                      s.position)))
         def escape_next_character():
             """Mark the next character that is to be added to the processed
             text as being escaped."""
-            escaped_positions.add(len(s.processed_text))
+            escaped_positions.append(len(s.processed_text))
         def copy_character(char=None):
             """Beware: It is only allowed that `char` is one single
             character. In particular, s.processed_text must consist only of
             single characters, otherwise len(s.processed_text) would yield a
-            wrong string length!
+            wrong string length!  (The unicode array enforces this with a
+            TypeError.)
             """
-            if char == None:
+            if char is None:
                 char = current_char
-            assert len(current_char) == 1
             s.processed_text.append(char)
             s.position += 1
         def resync_at_linestart():
@@ -361,34 +565,54 @@ class Excerpt(unicode):
             done at each start of a new line.  This is done here."""
             s.linenumber += 1
             s.last_linestart = s.position
-            comment_match = comment_line_pattern.match(original_text, s.position)
+            comment_match = cls.comment_line_pattern.match(original_text, s.position)
             if comment_match:
                 # Drop comment lines
                 drop_characters(comment_match.end() - comment_match.start())
             else:
                 drop_characters(0)
-
+        def copy_ordinary_characters(end):
+            """Copies all following characters without special meaning (see
+            `ordinary_characters_pattern`) in one go, but not beyond `end`.
+            This must only be called if no escape is pending."""
+            if end > s.position:
+                ordinary_characters = \
+                    cls.ordinary_characters_pattern.match(original_text, s.position, end).group()
+                s.processed_text.fromunicode(ordinary_characters)
+                s.position += len(ordinary_characters)
+
+        # The characters are copied to a unicode array, so make sure that they
+        # are unicode even if a str was given.
+        original_text = unicode(original_text)
         s = Excerpt.Status()
-        # For performance reasons, I use a list of unicode strings rather than
-        # a unicode string for the result string.  Before returning it, I will
-        # concetenate all list elements to one string.  This is really much
-        # faster for strings longer than a couple of 10k.
-        s.processed_text = []
-        original_positions = {}
-        escaped_positions = set()
+        # For performance reasons, I use a unicode array rather than a unicode
+        # string for the result string.  Before returning it, I will convert
+        # it to one string.  This is really much faster for strings longer
+        # than a couple of 10k.  In contrast to a list of single characters,
+        # the array holds the characters in one contiguous buffer.
+        s.processed_text = array.array("u")
+        # The original positions and the escaped positions are collected in
+        # lists first, and converted to a dict and a set, respectively, at the
+        # end.  This is cheaper than growing the dict and the set item by item.
+        original_positions = []
+        escaped_positions = []
         code_snippets_intervals = []
         deferred_escape = False
         resync_at_linestart()
         # For the sake of performance, I don't test every characters position
         # for input method matches, but look for the next upcoming match and
-        # store it.
+        # store it.  All searches share one scan through `original_text`.
+        candidates = cls.analyse_substitutions(pre_substitutions)[0].finditer(original_text) \
+            if pre_substitutions else None
         next_match_position, next_match_length, replacement = \
-            cls.get_next_match(original_text, pre_substitutions)
+            cls.get_next_match(original_text, pre_substitutions, candidates=candidates)
         # Next comes the Big While which crawls through the whole source code
-        # and preprocesses it.
+        # and preprocesses it.  Note that lookaheads are done with
+        # ``startswith`` rather than with slices because this doesn't create
+        # new string objects.
         while s.position < len(original_text):
             current_char = original_text[s.position]
-            if current_char in string.whitespace:
+            if current_char in whitespace_characters:
                 if deferred_escape and current_char in " \t":
                     # drop the tab or space
                     drop_characters(1)
@@ -399,23 +623,26 @@ class Excerpt(unicode):
                     # avoid generating a new position marker, I convert \r if
                     # followed by a \n to a space (so this may generate
                     # trailing spaces).
-                    if current_char == "\r" and original_text[s.position+1:s.position+2] == "\n":
-                        copy_character(" ")
-                    copy_character("\n")
+                    if current_char == "\r" and original_text.startswith("\n", s.position+1):
+                        copy_character(u" ")
+                    copy_character(u"\n")
                     # For performance, make a sync at every linestart
                     resync_at_linestart()
                 else:
                     copy_character()
+                    if not deferred_escape:
+                        # E.g. indentation, followed by ordinary characters
+                        copy_ordinary_characters(next_match_position)
                 continue
             if s.in_sourcecode:
-                if original_text[s.position:s.position+3] == "```":
+                if original_text.startswith("```", s.position):
                     code_snippets_intervals[-1] = \
                         (code_snippets_intervals[-1], len(s.processed_text))
                     copy_character()
                     copy_character()
                     copy_character()
                     s.in_sourcecode = False
-                elif original_text[s.position:s.position+2] == r"\`":
+                elif original_text.startswith(r"\`", s.position):
                     drop_characters(2)
                     next_character = original_text[s.position+2:s.position+3]
                     if next_character:
@@ -423,9 +650,11 @@ class Excerpt(unicode):
                         copy_character(next_character)
                 else:
                     copy_character()
+                    # Input method matches don't matter in source code
+                    copy_ordinary_characters(len(original_text))
                 continue
             if current_char == "\\":
-                if original_text[s.position+1:s.position+2] == "\\":
+                if original_text.startswith("\\", s.position+1):
                     if deferred_escape:
                         escape_next_character()
                         deferred_escape = False
@@ -435,18 +664,22 @@ class Excerpt(unicode):
                     continue
                 entity_match = cls.entity_pattern.match(original_text, s.position+1)
                 if entity_match:
-                    if entity_match.group("hex"):
-                        char = unichr(int(entity_match.group("hex"), 16))
-                    elif entity_match.group("dec"):
-                        char = unichr(int(entity_match.group("dec")))
+                    entity = entity_match.group()
+                    try:
+                        char = cls.entities[entity]
+                    except KeyError:
+                        if entity_match.group("hex"):
+                            char = unichr(int(entity_match.group("hex"), 16))
+                        elif entity_match.group("dec"):
+                            char = unichr(int(entity_match.group("dec")))
+                        cls.entities[entity] = char
                     if deferred_escape:
                         escape_next_character()
                         deferred_escape = False
                     copy_character(char)
                     drop_characters(entity_match.end() - entity_match.start())
                     continue
-            if (current_char == "[" and original_text[s.position+1:s.position+2] == "[") or \
-                    (current_char == "]" and original_text[s.position+1:s.position+2] == "]"):
+            if current_char in "[]" and original_text.startswith(current_char, s.position+1):
                 escape_next_character()
                 copy_character()
                 drop_characters(1)
@@ -455,7 +688,7 @@ class Excerpt(unicode):
             if s.position > next_match_position:
                 # I must update the next match
                 next_match_position, next_match_length, replacement = \
-                    cls.get_next_match(original_text, pre_substitutions, s.position)
+                    cls.get_next_match(original_text, pre_substitutions, s.position, candidates)
             if s.position == next_match_position:
                 if deferred_escape:
                     escape_next_character()
@@ -468,8 +701,10 @@ class Excerpt(unicode):
                 next_character = original_text[s.position+1:s.position+2]
                 if s.position + 1 == next_match_position:
                     drop_characters(1)
-                    copy_character(next_character)
-                elif next_character and (next_character not in string.whitespace):
+                    # At the end of the text, there is nothing to copy.
+                    if next_character:
+                        copy_character(next_character)
+                elif next_character and (next_character not in whitespace_characters):
                     escape_next_character()
                     drop_characters(1)
                     copy_character(next_character)
@@ -477,7 +712,7 @@ class Excerpt(unicode):
                     drop_characters(1)
                     deferred_escape = True
                 continue
-            if current_char == "`" and original_text[s.position+1:s.position+3] == "``" \
+            if current_char == "`" and original_text.startswith("``", s.position+1) \
                     and not deferred_escape:
                 s.in_sourcecode = True
                 copy_character()
@@ -490,9 +725,13 @@ class Excerpt(unicode):
                 escape_next_character()
                 deferred_escape = False
             copy_character()
+            # Usually, many ordinary characters follow, including spaces
+            # between words.  They are copied in one go up to the next input
+            # method match.
+            copy_ordinary_characters(next_match_position)
         if s.in_sourcecode:
             code_snippets_intervals[-1] = (code_snippets_intervals[-1], len(s.processed_text))
-        return u"".join(s.processed_text), original_positions, escaped_positions, \
+        return s.processed_text.tounicode(), dict(original_positions), set(escaped_positions), \
             code_snippets_intervals
     def __add__(self, other):
         concatenation = unicode(self) + unicode(other)
@@ -504,18 +743,37 @@ class Excerpt(unicode):
             concatenation.original_positions = self.original_positions.copy()
             length_first_part = len(self)
             length_first_part_original = len(self.original_text)
-            concatenation.original_positions.update\
-                ([(pos + length_first_part,
-                   other.original_positions[pos].transpose(length_first_part_original))
-                  for pos in other.original_positions if pos > 0])
             assert 0 in other.original_positions
-            concatenation.escaped_positions = self.escaped_positions | \
-                set([pos + length_first_part for pos in other.escaped_positions])
-            # FixMe: When the last interval from "self" and the first of "other"
-            # touch each other, they should be merged.
-            concatenation.code_snippets_intervals = self.code_snippets_intervals + \
-                [(start + length_first_part, end + length_first_part)
-                 for start, end in other.code_snippets_intervals]
+            # The positions of both parts are already sorted, and all
+            # positions of "other" (except for 0, which is dropped) come after
+            # those of "self".  So the sorted positions of the concatenation
+            # are simply appended rather than sorted again.
+            other_positions = [pos + length_first_part for pos in other.sorted_positions()[1:]]
+            concatenation.original_positions.update\
+                ([(pos, other.original_positions[pos - length_first_part].transpose(length_first_part_original))
+                  for pos in other_positions])
+            concatenation.__sorted_positions = self.sorted_positions() + other_positions
+            concatenation.escaped_positions = set(self.escaped_positions)
+            concatenation.escaped_positions.update(pos + length_first_part
+                                                   for pos in other.escaped_positions)
+            if self.__sorted_escaped_positions is not None and \
+                    other.__sorted_escaped_positions is not None:
+                # Like the sorted positions above, the sorted escaped positions
+                # of the concatenation are simply appended.
+                concatenation.__sorted_escaped_positions = self.__sorted_escaped_positions + \
+                    [pos + length_first_part for pos in other.__sorted_escaped_positions]
+            concatenation.code_snippets_intervals = []
+            for start, end in itertools.chain(self.code_snippets_intervals,
+                                              ((start + length_first_part, end + length_first_part)
+                                               for start, end in other.code_snippets_intervals)):
+                if concatenation.code_snippets_intervals and \
+                        concatenation.code_snippets_intervals[-1][1] == start:
+                    # When the last interval from "self" and the first of
+                    # "other" touch each other, they are merged.
+                    concatenation.code_snippets_intervals[-1] = \
+                        (concatenation.code_snippets_intervals[-1][0], end)
+                else:
+                    concatenation.code_snippets_intervals.append((start, end))
         else:
             # Note that adding an ordinary Unicode to an Excerpt should only be
             # done for simple cases.  At the moment, this functionality is only
@@ -526,7 +784,9 @@ class Excerpt(unicode):
             assert "\n" not in other
             concatenation.original_text = self.original_text + other
             concatenation.original_positions = self.original_positions.copy()
+            concatenation.__sorted_positions = self.__sorted_positions
             concatenation.escaped_positions = self.escaped_positions
+            concatenation.__sorted_escaped_positions = self.__sorted_escaped_positions
             concatenation.code_snippets_intervals = self.code_snippets_intervals
         return concatenation
     def __getitem__(self, key):
@@ -538,19 +798,12 @@ class Excerpt(unicode):
         marker = self.original_positions.get(key, self.original_position(key))
         character.original_text = \
             self.original_text[marker.index:self.original_position(key+1).index]
-        marker.index = 0
-        character.original_positions = {0: marker}
+        character.original_positions = {0: marker.transpose(-marker.index)}
         if key in self.escaped_positions:
             character.escaped_positions = set([0])
         else:
             character.escaped_positions = set()
-        character.code_snippets_intervals = []
-        for start, end in self.code_snippets_intervals:
-            if start <= key < end:
-                character.code_snippets_intervals = [(0, 1)]
-                break
-            if key < start:
-                break
+        character.code_snippets_intervals = [(0, 1)] if self.in_code_snippet(key) else []
         return character
     def __getslice__(self, i, j):
         length = len(self)
@@ -563,12 +816,21 @@ class Excerpt(unicode):
         offset = start_marker.index
         slice_.original_text = \
             self.original_text[start_marker.index:self.original_position(j).index]
+        sorted_positions = self.sorted_positions()
+        sorted_positions = sorted_positions[bisect.bisect_left(sorted_positions, i):
+                                            bisect.bisect_left(sorted_positions, j)]
         slice_.original_positions = \
             dict([(pos - i, self.original_positions[pos].transpose(-offset))
-                  for pos in self.original_positions if i <= pos < j])
+                  for pos in sorted_positions])
+        slice_.__sorted_positions = [pos - i for pos in sorted_positions]
         if 0 not in slice_.original_positions:
             slice_.original_positions[0] = start_marker.transpose(-offset)
-        slice_.escaped_positions = set([pos - i for pos in self.escaped_positions if i <= pos < j])
+            slice_.__sorted_positions.insert(0, 0)
+        sorted_escaped_positions = self.sorted_escaped_positions()
+        slice_.__sorted_escaped_positions = \
+            [pos - i for pos in sorted_escaped_positions[bisect.bisect_left(sorted_escaped_positions, i):
+                                                         bisect.bisect_left(sorted_escaped_positions, j)]]
+        slice_.escaped_positions = set(slice_.__sorted_escaped_positions)
         slice_.code_snippets_intervals = \
             [(start - i, end - i) for start, end in self.code_snippets_intervals
              if start < j and end > i]
@@ -576,7 +838,7 @@ class Excerpt(unicode):
             slice_.code_snippets_intervals[0] = (max(slice_.code_snippets_intervals[0][0], 0),
                                                  slice_.code_snippets_intervals[0][1])
             slice_.code_snippets_intervals[-1] = (slice_.code_snippets_intervals[-1][0],
-                                                  min(slice_.code_snippets_intervals[-1][1], j))
+                                                  min(slice_.code_snippets_intervals[-1][1], j - i))
         return slice_
     @classmethod
     def apply_post_input_method(cls, excerpt):
@@ -600,86 +862,81 @@ class Excerpt(unicode):
 
         :rtype: unicode, dict, set, list
         """
-        # The following functions seem to violate an important programming
-        # rule: They modify variables of the outer scope, i.e. the enclosing
-        # function (side effects).  However, they are simple to explain and
-        # they do simple things, so this approach leads to easy-to-comprehend
-        # code.  Therefore, I make an exception to that rule.
-        #
-        # Their semantics are taken from those in apply_pre_input_method(),
-        # however, their implementation differs a little bit.
-        def drop_characters(number_of_characters):
-            """This routine must be called immediately after the character is
-            being added to `preprocessed_text` and the current `position`
-            points to the next character in `original_text` to be processed.
-            """
-            s.position += number_of_characters
-            if s.position not in excerpt.original_positions:
-                original_positions[len(s.processed_text)] = excerpt.original_position(s.position)
-        def copy_character(char=None):
-            if char == None:
-                char = current_char
-            s.processed_text += char
-            s.position += 1
+        def processed_position(position):
+            """Maps a position in the excerpt to the position in the processed
+            text.  Every substitution before `position` shrinks the text by
+            its match length minus one.  `position` must not lie within a
+            substituted span."""
+            return position - shifts[bisect.bisect_right(span_ends, position)]
+        def is_substituted(position):
+            """Returns whether `position` lies within a substituted span,
+            excluding its first character."""
+            return bisect.bisect_left(span_starts, position) > \
+                bisect.bisect_right(span_ends, position)
 
-        s = Excerpt.Status()
-        original_positions = {}
-        escaped_positions = set()
-        code_snippets_intervals = []
-        original_code_snippets_intervals = excerpt.code_snippets_intervals[:]
-        # For the sake of performance, I don't test every characters position
-        # for input method matches, but look for the next upcoming match and
-        # store it.
         text = unicode(excerpt)
-        next_match_position, next_match_length, replacement = \
-            cls.get_next_match(text, excerpt.__post_substitutions)
-        # Next comes the Big While which crawls through the whole source code
-        # and postprocesses it.
-        while s.position < len(text):
-            if s.position in excerpt.escaped_positions:
-                escaped_positions.add(len(s.processed_text))
-            if s.in_sourcecode:
-                if s.position >= original_code_snippets_intervals[0][1]:
-                    del original_code_snippets_intervals[0]
-                    s.in_sourcecode = False
-                    code_snippets_intervals[-1] = \
-                        (code_snippets_intervals[-1], len(s.processed_text))
-            if original_code_snippets_intervals:
-                if s.position >= original_code_snippets_intervals[0][0]:
-                    code_snippets_intervals.append(len(s.processed_text))
-                    s.in_sourcecode = True
-            if s.position in excerpt.original_positions:
-                original_positions[len(s.processed_text)] = excerpt.original_positions[s.position]
-            if s.in_sourcecode:
-                copy_character()
+        if not excerpt.__post_substitutions:
+            # Without post input method, there is nothing to substitute, so
+            # the excerpt is taken over unchanged.
+            return text, dict((position, marker) for position, marker
+                              in excerpt.original_positions.iteritems() if position < len(text)), \
+                set(excerpt.escaped_positions), excerpt.code_snippets_intervals[:]
+        # First, I collect the spans of all substitutions to be applied.  A
+        # match is applied only if it starts with a non-whitespace character
+        # outside code snippets, and contains no escaped characters.
+        spans = []
+        snippet_index = 0
+        position = 0
+        # All searches share one scan through `text`, see
+        # `apply_pre_input_method`.
+        candidates = cls.analyse_substitutions(excerpt.__post_substitutions)[0].finditer(text)
+        sorted_escaped_positions = excerpt.sorted_escaped_positions()
+        while position < len(text):
+            match_position, match_length, replacement = \
+                cls.get_next_match(text, excerpt.__post_substitutions, position, candidates)
+            if not match_length:
+                break
+            position = match_position + 1
+            while snippet_index < len(excerpt.code_snippets_intervals) and \
+                    excerpt.code_snippets_intervals[snippet_index][1] <= match_position:
+                snippet_index += 1
+            if snippet_index < len(excerpt.code_snippets_intervals) and \
+                    excerpt.code_snippets_intervals[snippet_index][0] <= match_position:
                 continue
-            current_char = text[s.position]
-            if current_char in string.whitespace:
-                copy_character()
+            if text[match_position] in whitespace_characters:
                 continue
-            if s.position > next_match_position:
-                # I must update the next match
-                next_match_position, next_match_length, replacement = \
-                    cls.get_next_match(text, excerpt.__post_substitutions, s.position)
-            if s.position == next_match_position:
-                any_escaped = False
-                for i in range(s.position, s.position + next_match_length):
-                    if i in excerpt.escaped_positions:
-                        any_escaped = True
-                        break
-                if not any_escaped:
-                    copy_character(replacement)
-                    drop_characters(next_match_length - 1)
-                    continue
-            # Now for the usual case of an ordinary character
-            copy_character()
-        if s.in_sourcecode:
-            assert len(original_code_snippets_intervals) == 1
-            assert original_code_snippets_intervals[0] == len(text)
-            code_snippets_intervals[-1] = (code_snippets_intervals[-1], len(s.processed_text))
-        else:
-            assert not original_code_snippets_intervals
-        return s.processed_text, original_positions, escaped_positions, code_snippets_intervals
+            match_end = match_position + match_length
+            i = bisect.bisect_left(sorted_escaped_positions, match_position)
+            if i < len(sorted_escaped_positions) and sorted_escaped_positions[i] < match_end:
+                continue
+            spans.append((match_position, match_end, replacement))
+            position = match_end
+        # Then, the processed text is stitched together from the unchanged
+        # parts and the replacements, and all positions are transferred.
+        processed_text = []
+        span_starts, span_ends, shifts = [], [], [0]
+        last_end = 0
+        for start, end, replacement in spans:
+            processed_text.append(text[last_end:start])
+            processed_text.append(replacement)
+            span_starts.append(start)
+            span_ends.append(end)
+            shifts.append(shifts[-1] + end - start - 1)
+            last_end = end
+        processed_text.append(text[last_end:])
+        original_positions = {}
+        for position, marker in excerpt.original_positions.iteritems():
+            if position < len(text) and not is_substituted(position):
+                original_positions[processed_position(position)] = marker
+        for end in span_ends:
+            if end not in excerpt.original_positions:
+                original_positions[processed_position(end)] = excerpt.original_position(end)
+        escaped_positions = set(processed_position(position)
+                                for position in excerpt.escaped_positions)
+        code_snippets_intervals = [(processed_position(start), processed_position(end))
+                                   for start, end in excerpt.code_snippets_intervals]
+        return u"".join(processed_text), original_positions, escaped_positions, \
+            code_snippets_intervals
     def __new__(cls, excerpt, mode, url=None,
                 pre_substitutions=None, post_substitutions=None):
         """Here I create the instance.  I create a unicode object and add some
@@ -734,6 +991,8 @@ class Excerpt(unicode):
             self.original_text = excerpt.original_text
             self.__post_substitutions = None
         self.__escaped_text = None
+        self.__sorted_positions = None
+        self.__sorted_escaped_positions = None
         return self
     def apply_postprocessing(self):
         """Applies the rules for post processing this the excerpt and returns
@@ -754,8 +1013,116 @@ class Excerpt(unicode):
 # configuration.
 input_methods_path = os.path.join(common.modulepath, "data")
 
-def read_input_method(input_method_name):
-    """Return the substitution dictionary for one input method.
+# Buffer size for reading Bobcat and input method files.  The files are read
+# as a whole and decoded in memory, so a large buffer saves system calls.
+buffer_size = 128 * 1024
+
+# Pattern for the lines of input method files after the two header lines.  It
+# is applied to the whole file at once with ``finditer``, and every match is
+# exactly one line (including its line break).  A line is either empty, a
+# comment, a substitution, or invalid.
+input_method_line_pattern = re.compile(
+    r"(?:(?P<comment>\.\.(?: [^\n]*)?[^\S\n]*|[^\S\n]*)"
+    r"|(?P<match>[^\n]+?)\t+"
+    r"(?:(?P<replacement>[^\n])|#(?P<dec>[0-9]+)|0x(?P<hex>[0-9a-fA-F]+))"
+    r"(?:[ \t\r\f\v][^\n]*)?"
+    r"|(?P<invalid>[^\n]*))(?:\n|\Z)", re.UNICODE)
+
+replacement_characters = {}
+
+regex_special_characters = frozenset(u".^$*+?{}[]\\|()")
+def escape_match(match):
+    """Escape a literal match of an input method so that it can be used as a
+    regular expression.  In contrast to ``re.escape``, only characters with a
+    special meaning in regular expressions are escaped.  This way, most
+    matches remain unchanged, and single characters stay single characters.
+
+    :Parameters:
+      - `match`: the literal match
+
+    :type match: unicode
+
+    :Return:
+      the regular expression matching exactly `match`
+
+    :rtype: unicode
+    """
+    if not regex_special_characters.intersection(match):
+        return match
+    return u"".join(u"\\" + character if character in regex_special_characters else character
+                    for character in match)
+
+def literal_text(pattern):
+    """Return the literal string matched by a regular expression of a
+    substitution, if it matches only one literal string.  Only unescaped
+    characters without special meaning and backslash-escaped non-alphanumeric
+    characters are considered literal; anything else makes the pattern a
+    genuine regular expression.
+
+    :Parameters:
+      - `pattern`: the regular expression
+
+    :type pattern: unicode
+
+    :Return:
+      the literal string, or None if `pattern` is not a mere literal
+
+    :rtype: unicode
+    """
+    literal = []
+    i = 0
+    while i < len(pattern):
+        character = pattern[i]
+        if character == "\\":
+            if i + 1 == len(pattern) or pattern[i+1].isalnum():
+                return None
+            literal.append(pattern[i+1])
+            i += 2
+        elif character in regex_special_characters:
+            return None
+        else:
+            literal.append(character)
+            i += 1
+    return u"".join(literal)
+
+def trie_pattern(literals):
+    """Return a regular expression which matches all given literal strings.
+    The literals are arranged in a trie, so common prefixes are matched only
+    once rather than once per literal.  The order of the alternatives doesn't
+    matter because the pattern is only used to find positions where one of
+    the literals starts.
+
+    :Parameters:
+      - `literals`: the literal strings; they must not be empty
+
+    :type literals: iterable of unicode
+
+    :Return:
+      the regular expression
+
+    :rtype: unicode
+    """
+    trie = {}
+    for literal in literals:
+        node = trie
+        for character in literal:
+            node = node.setdefault(character, {})
+        # The empty string marks the end of a literal.
+        node[u""] = None
+    def build(node):
+        alternatives = [re.escape(character) + build(child)
+                        for character, child in sorted(node.iteritems()) if character]
+        if not alternatives:
+            return u""
+        result = alternatives[0] if len(alternatives) == 1 else u"(?:" + u"|".join(alternatives) + u")"
+        if u"" in node:
+            result = (u"(?:" + result + u")" if len(alternatives) == 1 else result) + u"?"
+        return result
+    return build(trie)
+
+def read_single_input_method(input_method_name):
+    """Read one input method file.  In contrast to `read_input_method`, the
+    parental input methods are not resolved but only returned by name.
 
     :Parameters:
       - `input_method_name`: name of the input method, e.g. "minimal"
@@ -763,42 +1130,41 @@ def read_input_method(input_method_name):
     :type input_method_name: string
 
     :Return:
-      A list with the (match, replacement) tuples.  Both are strings, the first
-      being a regular expression, and the second one single character. Their
-      order is the same as in the file, and duplicates are not deleted.
+      - the (match, replacement) tuples of the pre input method
+      - the (match, replacement) tuples of the post input method
+      - the names of the parental input methods
 
-    :rtype: list
+    :rtype: list, list, list of str
 
     :Exceptions:
       - `LocalVariablesError`: if the first line is not a local variables line
       - `FileError`: if there is an invalid line in the file
     """
     if input_method_name == "none":
-        return [], []
+        return [], [], []
     pre_substitutions = []
     post_substitutions = []
     filename = os.path.join(input_methods_path, input_method_name+".bim")
-    local_variables = common.parse_local_variables(open(filename).readline(), force=True)
+    input_method_file = io.open(filename, "rb", buffering=buffer_size)
+    try:
+        raw_contents = input_method_file.read()
+    finally:
+        input_method_file.close()
+    local_variables = common.parse_local_variables(raw_contents.split("\n", 1)[0], force=True)
     if local_variables.get("input-method-name") != input_method_name:
         raise FileError("input method name in first line doesn't match file name", filename)
-    input_method_file = codecs.open(filename, encoding=local_variables.get("coding", "utf8"))
-    input_method_file.readline()
-    if not re.match(r"\.\. Bobcat input method\Z", input_method_file.readline().rstrip()):
+    lines = raw_contents.decode(local_variables.get("coding", "utf8")).split("\n", 2)
+    if len(lines) < 2 or lines[1].rstrip() != u".. Bobcat input method":
         raise FileError("second line is invalid", filename)
-    if "parental-input-method" in local_variables:
-        for input_method in local_variables["parental-input-method"].split(","):
-            parent_pre, parent_post = read_input_method(input_method)
-            pre_substitutions.extend(parent_pre)
-            post_substitutions.extend(parent_post)
-    line_pattern = re.compile(r"(?P<match>.+?)\t+"
-                              r"((?P<replacement>.)|(#(?P<dec>\d+))|(0x(?P<hex>[0-9a-fA-F]+)))"
-                              r"(\s+.*\s*)?\Z")
-    for i, line in enumerate(input_method_file):
+    body = lines[2] if len(lines) > 2 else u""
+    parents = local_variables.get("parental-input-method", [])
+    if isinstance(parents, basestring):
+        parents = [parents]
+    for i, line_match in enumerate(input_method_line_pattern.finditer(body)):
         linenumber = i + 3
-        if line.strip() == "" or line.rstrip() == ".."  or line.startswith(".. "):
+        if line_match.group("comment") is not None:
             continue
-        line_match = line_pattern.match(line)
-        if not line_match:
+        if line_match.group("invalid") is not None:
             raise FileError("line %d is invalid" % linenumber, filename)
         match = line_match.group("match")
         post = match.startswith("POST::")
@@ -809,19 +1175,112 @@ def read_input_method(input_method_name):
             if re.match(u"(?:"+match+u")?", "").groups():
                 raise FileError("the match in line %d contains a group" % linenumber, filename)
         else:
-            match = re.escape(match)
+            match = escape_match(match)
         if line_match.group("replacement"):
             replacement = line_match.group("replacement")
         elif line_match.group("dec"):
             replacement = unichr(int(line_match.group("dec")))
         elif line_match.group("hex"):
             replacement = unichr(int(line_match.group("hex"), 16))
+        replacement = replacement_characters.setdefault(replacement, replacement)
         if post:
             post_substitutions.append((match, replacement))
         else:
             pre_substitutions.append((match, replacement))
+    return pre_substitutions, post_substitutions, parents
+
+def read_input_method(input_method_name):
+    """Return the substitution dictionary for one input method.  The
+    substitutions of the parental input methods come first, followed by the
+    input method's own ones.
+
+    The tree of parental input methods is walked without recursion, and every
+    input method file is read only once.  If the same input method is
+    inherited several times, only its last occurrence is taken into account.
+    Since later substitutions take precedence, this has the same effect as
+    including it every time.
+
+    :Parameters:
+      - `input_method_name`: name of the input method, e.g. "minimal"
+
+    :type input_method_name: string
+
+    :Return:
+      Two lists with the (match, replacement) tuples, the first one for the
+      pre input method, the second one for the post input method.  Both are
+      strings, the first being a regular expression, and the second one single
+      character.  Within one input method, their order is the same as in the
+      file.  Substitutions of an input method inherited several times are
+      included only once, see above; other duplicates are not deleted.
+
+    :rtype: list, list
+
+    :Exceptions:
+      - `LocalVariablesError`: if the first line is not a local variables line
+      - `FileError`: if there is an invalid line in the file, or if an input
+        method is its own parent
+    """
+    input_methods = {}
+    order = []
+    # Every stack item holds the name of an input method and the list of its
+    # parents which have not been visited yet.
+    stack = [(input_method_name, None)]
+    while stack:
+        name, parents = stack[-1]
+        if parents is None:
+            if name not in input_methods:
+                input_methods[name] = read_single_input_method(name)
+            parents = list(reversed(input_methods[name][2]))
+            stack[-1] = (name, parents)
+        if parents:
+            parent = parents.pop()
+            if parent in [ancestor for ancestor, __ in stack]:
+                raise FileError("input method \"%s\" is its own parent" % parent,
+                                os.path.join(input_methods_path, name+".bim"))
+            stack.append((parent, None))
+        else:
+            del stack[-1]
+            order.append(name)
+    pre_substitutions = []
+    post_substitutions = []
+    for i, name in enumerate(order):
+        if name not in order[i+1:]:
+            pre, post, __ = input_methods[name]
+            pre_substitutions.extend(pre)
+            post_substitutions.extend(post)
     return pre_substitutions, post_substitutions
 
+compiled_patterns = {}
+prepared_substitutions = {}
+def compile_pattern(pattern):
+    """Compile the regular expression of a substitution.  The compiled
+    patterns are cached in `compiled_patterns`, so that substitutions shared
+    by several input methods or files are compiled only once.
+
+    ``re.MULTILINE`` is only necessary for patterns with ``^`` or ``$``
+    anchors.  To be on the safe side, it is set whenever one of both
+    characters occurs in the pattern at all, be it escaped or not.
+
+    If the third-party module ``regex`` is installed, it is used instead of
+    ``re``.
+
+    :Parameters:
+      - `pattern`: the regular expression of the substitution
+
+    :type pattern: unicode
+
+    :Return:
+      the compiled pattern
+
+    :rtype: re.pattern
+    """
+    try:
+        return compiled_patterns[pattern]
+    except KeyError:
+        flags = substitutions_re.MULTILINE if "^" in pattern or "$" in pattern else 0
+        compiled_pattern = compiled_patterns[pattern] = substitutions_re.compile(pattern, flags)
+        return compiled_pattern
+
 def process_text(text, filepath, input_method):
     """Take the raw contents of the Bobcat file and turn it into "digested"
     contents with applied input method and marking of escaped characters.
@@ -843,17 +1302,40 @@ def process_text(text, filepath, input_method):
 
     :rtype: Excerpt
     """
+    def literal_character(match):
+        """Return the character if the regular expression `match` matches
+        exactly one literal character, otherwise None."""
+        literal = literal_text(match)
+        return literal if literal and len(literal) == 1 else None
     def sort_and_filter_substitutions(substitutions):
         """Sort and filter the list of substitutions: Reverse order, and remove
         duplicates.  Additionally, complile the regular expressions to match
-        objects."""
+        objects.
+
+        Adjacent substitutions of single literal characters are combined into
+        one character class.  Its replacement is a translation table for
+        ``unicode.translate`` instead of a single character.  Since only
+        adjacent ones are combined, the order of precedence is preserved."""
         hitherto_matches = set()
         sorted_substitutions = []
-        for i in range(len(substitutions)):
-            match, replacement = substitutions[-i-1]
+        translation_table = None
+        for match, replacement in reversed(substitutions):
             if match not in hitherto_matches:
                 hitherto_matches.add(match)
-                sorted_substitutions.append((re.compile(match, re.MULTILINE), replacement))
+                character = literal_character(match)
+                if character is None:
+                    translation_table = None
+                    sorted_substitutions.append((compile_pattern(match), replacement))
+                else:
+                    if translation_table is None:
+                        translation_table = {}
+                        sorted_substitutions.append((None, translation_table))
+                    translation_table[ord(character)] = replacement
+        for i, (pattern, replacement) in enumerate(sorted_substitutions):
+            if pattern is None:
+                characters = u"".join(unichr(code) for code in replacement)
+                sorted_substitutions[i] = (compile_pattern(u"[" + re.escape(characters) + u"]"),
+                                           replacement)
         return sorted_substitutions
     
     # First, read the input method(s)
@@ -861,27 +1343,43 @@ def process_text(text, filepath, input_method):
         input_methods = input_method
     else:
         input_methods = [input_method]
-    pre_substitutions = []
-    post_substitutions = []
-    for input_method in input_methods:
-        pre, post = read_input_method(input_method)
-        pre_substitutions.extend(pre)
-        post_substitutions.extend(post)
-    pre_substitutions = sort_and_filter_substitutions(pre_substitutions)
-    post_substitutions = sort_and_filter_substitutions(post_substitutions)
+    key = (input_methods_path, tuple(input_methods))
+    try:
+        pre_substitutions, post_substitutions = prepared_substitutions[key]
+    except KeyError:
+        pre_substitutions = []
+        post_substitutions = []
+        for input_method in input_methods:
+            pre, post = read_input_method(input_method)
+            pre_substitutions.extend(pre)
+            post_substitutions.extend(post)
+        # For the "none" input method, there is nothing to sort or to compile.
+        if pre_substitutions:
+            pre_substitutions = sort_and_filter_substitutions(pre_substitutions)
+        if post_substitutions:
+            post_substitutions = sort_and_filter_substitutions(post_substitutions)
+        prepared_substitutions[key] = pre_substitutions, post_substitutions
     # Now, apply it to the contents
     return Excerpt(text, "PRE", filepath, pre_substitutions, post_substitutions)
 
-def detect_header_data(bobcat_file):
+# Pattern for the second line of Bobcat files.  If it matches, but the group is
+# None, the line is an invalid Bobcat version line.
+bobcat_version_line_pattern = re.compile(r"\.\. \s*Bobcat(?:\s+([0-9]+\.[0-9]+)\s*\Z)?")
+
+def detect_header_data(raw_contents, filename):
     """Detect the local variables of the given text file and the Bobcat format
     version according to its first two lines.  This is very similar to the
     method used for Python source files.  There is no default encoding, the
     default input method is "minimal".
 
     :Parameters:
-      - `bobcat_file`: source file, with the file pointer set to the start
+      - `raw_contents`: undecoded contents of the source file.  Only its first
+        two lines are inspected, and they are not decoded since they must
+        consist of ASCII characters anyway.
+      - `filename`: name of the source file; only used for error messages
 
-    :type bobcat_file: string
+    :type raw_contents: str
+    :type filename: str
 
     :Return:
       - encoding of the file.  If none was found, it returns None.
@@ -891,26 +1389,30 @@ def detect_header_data(bobcat_file):
 
     :rtype: string, string, string
     """
-    first_line = bobcat_file.readline()
+    header_lines = raw_contents.split("\n", 2)
+    first_line = header_lines[0]
     local_variables = common.parse_local_variables(first_line)
     if local_variables != None:
         coding = local_variables.get("coding")
         input_method = local_variables.get("input-method", "minimal")
-        second_line = bobcat_file.readline()
+        second_line = header_lines[1] if len(header_lines) > 1 else ""
     else:
         coding, input_method = None, "minimal"
         second_line = first_line
-    if re.match(r"\.\. \s*Bobcat", second_line):
-        bobcat_version_match = re.match(r"\.\. \s*Bobcat\s+([0-9]+\.[0-9]+)\s*\Z", second_line)
-        if bobcat_version_match:
-            bobcat_version = bobcat_version_match.group(1)
-        else:
-            raise FileError("Bobcat version line was invalid", bobcat_file.name)
+    bobcat_version_match = bobcat_version_line_pattern.match(second_line)
+    if bobcat_version_match:
+        bobcat_version = bobcat_version_match.group(1)
+        if not bobcat_version:
+            raise FileError("Bobcat version line was invalid", filename)
     else:
         warnings.warn("No Bobcat version was specified.  I assume 1.0.")
         bobcat_version = "1.0"
     return coding, input_method, bobcat_version
 
+# All octets which may occur in files that are auto-detected as Latin-1, see
+# `load_file`.
+latin1_characters = "".join(chr(i) for i in range(256) if not 0x80 <= i <= 0x9f)
+
 def load_file(filename):
     """Load the Bobcat file "filename" and return an `Excerpt` instance containing
     that file.
@@ -928,11 +1430,39 @@ def load_file(filename):
 
     :rtype: Excerpt, string, string
     """
-    encoding, input_method, bobcat_version = detect_header_data(open(filename))
+    bobcat_file = io.open(filename, "rb", buffering=buffer_size)
+    try:
+        raw_contents = bobcat_file.read()
+    finally:
+        bobcat_file.close()
+    return load_string(raw_contents, filename)
+
+def load_string(raw_contents, filename):
+    """Process the raw contents of a Bobcat file and return an `Excerpt`
+    instance containing them.  This does the same as `load_file` but doesn't
+    read the file itself, e.g. because the contents are already in memory.
+
+    :Parameters:
+      - `raw_contents`: the undecoded contents of the Bobcat file
+      - `filename`: Bobcat filename, used for the position markers and for
+        error messages
+
+    :type raw_contents: str
+    :type filename: string
+
+    :Return:
+      - `Excerpt` with the contents of the file
+      - auto-detected encoding of the file.  None if the encoding was given
+        explicitly in the file.
+      - Bobcat version of the file as a string
+
+    :rtype: Excerpt, string, string
+    """
+    encoding, input_method, bobcat_version = detect_header_data(raw_contents, filename)
     # First, auto-detect encoding
     if encoding:
         try:
-            lines = codecs.open(filename, encoding=encoding).readlines()
+            text = raw_contents.decode(encoding)
             encoding = None
         except UnicodeDecodeError:
             raise EncodingError("The encoding given in the file (%s) was wrong." % encoding,
@@ -942,30 +1472,21 @@ def load_file(filename):
                       "Please specify file encoding explicitly.")
         # Test for UTF-8
         try:
-            lines = codecs.open(filename, encoding="utf-8").readlines()
+            text = raw_contents.decode("utf-8")
             encoding = "utf-8"
         except UnicodeDecodeError:
-            lines = []
-            # Test for Latin-1
-            for line in open(filename):
-                for char in line:
-                    # Cheap heuristics: the characters 0x80...0x9f almost never
-                    # occur in Latin-1.
-                    if 0x80 <= ord(char) <= 0x9f:
-                        break
-                else:
-                    lines.append(line.decode("latin-1"))
-                    continue
-                break
-            else:
+            # Test for Latin-1.  Cheap heuristics: the characters 0x80...0x9f
+            # almost never occur in Latin-1.  Deleting all other characters
+            # must leave nothing.
+            if not raw_contents.translate(None, latin1_characters):
+                text = raw_contents.decode("latin-1")
                 encoding = "latin-1"
             if not encoding:
                 # Test for cp1252
                 try:
-                    return codecs.open(filename, encoding="cp1252").readlines(), "cp1252", \
-                        bobcat_version
+                    text = raw_contents.decode("cp1252")
+                    encoding = "cp1252"
                 except UnicodeDecodeError:
                     raise EncodingError("Couldn't auto-detect file encoding.  "
                                         "Please specify explicitly.", filename)
-    text = process_text(u"".join(lines), filename, input_method)
-    return text, encoding, bobcat_version
+    return process_text(text, filename, input_method), encoding, bobcat_version
@@ -32,13 +32,55 @@ Of course, the mapping works in both directions as expected:
     >>> "{mit}_{t}hesis".decode("safefilename")
     u'MIT Thesis'
 
+If you don't need the codec interface, `encode_str` and `decode_str` do the
+same without its overhead:
+
+    >>> encode_str(u"MIT Thesis")
+    '{mit}_{t}hesis'
+    >>> decode_str("{mit}_{t}hesis")
+    u'MIT Thesis'
+
 """
 
-import codecs
+import codecs, re, string, sys
+
+# The character classes are frozensets because testing membership in them is
+# much faster than scanning a string.
+lowercase_letters = frozenset("abcdefghijklmnopqrstuvwxyz")
+safe_characters = lowercase_letters | frozenset("0123456789-+!$%&'@~#.,^")
+uppercase_letters = frozenset(letter.upper() for letter in lowercase_letters)
 
-lowercase_letters = "abcdefghijklmnopqrstuvwxyz"
-safe_characters = lowercase_letters + "0123456789-+!$%&'@~#.,^"
-uppercase_letters = lowercase_letters.upper()
+# Pattern for `encode`.  Every match is a run of safe characters, of spaces, or
+# of uppercase letters, or one other character.
+encode_pattern = re.compile(r"(?P<safe>[%s]+)|(?P<spaces> +)|(?P<uppercase>[%s]+)|(?P<other>.)" %
+                            (re.escape("".join(sorted(safe_characters))),
+                             "".join(sorted(uppercase_letters))), re.DOTALL)
+
+# Pattern for `decode`.  Every match is a run of safe characters and
+# underscores, a braces sequence (possibly unclosed), a parentheses sequence,
+# an unclosed parenthesis with the hex digits following it, or one other
+# character.  The underscores in plain runs are translated to spaces by
+# `underscores_to_spaces`.
+decode_pattern = re.compile(r"(?P<plain>[%s]+)|(?P<braces>\{[a-z]*\}?)|(?P<parentheses>\([^)]*\))|"
+                            r"(?P<unclosed>\([0-9a-f]{0,8})|(?P<other>.)" %
+                            re.escape("".join(sorted(safe_characters | frozenset("_")))), re.DOTALL)
+underscores_to_spaces = string.maketrans("_", " ")
+# Pattern for the contents of a parentheses sequence in `decode`.
+hex_code_pattern = re.compile(r"[0-9a-fA-F]+\Z")
+
+# Patterns for the common case of names which need no escaping, i.e. which
+# consist of safe characters and spaces (for `encode`) or of safe characters
+# and underscores (for `decode`).  Such names are converted in one step.
+plain_name_pattern = re.compile(r"[%s ]*\Z" % re.escape("".join(sorted(safe_characters))))
+plain_filename_pattern = re.compile(r"[%s]*\Z" % re.escape("".join(sorted(safe_characters | frozenset("_")))))
+
+# Caches for characters which are encoded as hexadecimal codes in parentheses.
+# `encoded_characters` maps characters to their codes including the
+# parentheses, `decoded_characters` maps codes without the parentheses to
+# their characters.  Filenames are usually made of few distinct characters, so
+# most codes are computed only once.
+encoded_characters = {}
+decoded_characters = {}
 
 def encode(filename, errors='strict'):
     """Convert Unicode strings to safe filenames.
@@ -56,26 +98,32 @@ def encode(filename, errors='strict'):
 
     :rtype: str
     """
-    output = ""
-    i = 0
-    input_length = len(filename)
-    while i < input_length:
-        char = filename[i]
-        if char in safe_characters:
-            output += str(char)
-        elif char == " ":
-            output += "_"
-        elif char in uppercase_letters:
-            output += "{"
-            while i < input_length and filename[i] in uppercase_letters:
-                output += str(filename[i]).lower()
-                i += 1
-            output += "}"
-            continue
+    if plain_name_pattern.match(filename):
+        return str(filename).replace(" ", "_"), len(filename)
+    # The output is collected in a list and joined at the end because
+    # repeated string concatenation may be quadratic.  The input is scanned in
+    # runs of characters of the same kind by `encode_pattern`.
+    output = []
+    for match in encode_pattern.finditer(filename):
+        kind = match.lastgroup
+        if kind == "safe":
+            output.append(str(match.group()))
+        elif kind == "spaces":
+            output.append(len(match.group()) * "_")
+        elif kind == "uppercase":
+            output.append("{" + str(match.group()).lower() + "}")
         else:
-            output += "(" + hex(ord(char))[2:] + ")"
-        i += 1
-    return output, input_length
+            character = match.group()
+            code = encoded_characters.get(character)
+            if code is None:
+                code = encoded_characters[character] = "(%x)" % ord(character)
+            output.append(code)
+    return "".join(output), len(filename)
+
+# Replacements for problematic characters in `decode`, depending on the
+# ``errors`` parameter.  For all other values, e.g. ``"strict"``, an exception
+# is raised instead.
+error_replacements = {"ignore": u"", "replace": u"?"}
 
 def handle_problematic_characters(errors, filename, start, end, message):
     """Trivial helper routine in case something goes wrong in `decode`.
@@ -102,12 +150,10 @@ def handle_problematic_characters(errors, filename, start, end, message):
 
     :rtype: unicode
     """
-    if errors == 'ignore':
-        return u""
-    elif errors == 'replace':
-        return u"?"
-    else:
+    replacement = error_replacements.get(errors)
+    if replacement is None:
         raise UnicodeDecodeError("safefilename", filename, start, end, message)
+    return replacement
 
 def decode(filename, errors='strict'):
     """Convert safe filenames to Unicode strings.
@@ -128,58 +174,96 @@ def decode(filename, errors='strict'):
     """
     filename = str(filename)
     input_length = len(filename)
-    output = u""
-    i = 0
-    while i < input_length:
-        char = filename[i]
-        if char in safe_characters:
-            output += char
-        elif char == "_":
-            output += " "
-        elif char == "{":
-            i += 1
-            while i < input_length and filename[i] in lowercase_letters:
-                output += filename[i].upper()
-                i += 1
-            if i == input_length:
-                # In you want to implement StreamReaders: If the string
-                # didn't start with this parentheses sequence, it should
-                # return from here with a smaller value for consumed_length
-                handle_problematic_characters(errors, filename, i-1, i,
-                                              "open brace was never closed")
-                continue
-            if filename[i] != '}':
-                handle_problematic_characters(
-                    errors, filename, i, i+1,
-                    "invalid character '%s' in braces sequence" % filename[i])
-                continue
-        elif char == "(":
-            end_position = filename.find(")", i)
-            if end_position == -1:
-                end_position = i+1
-                while end_position < input_length and \
-                        filename[end_position] in "0123456789abcdef" and \
-                        end_position - i <= 8:
-                    end_position += 1
-                # In you want to implement StreamReaders: If the string
-                # didn't start with this curly braces sequence, it should
-                # return from here with a smaller value for consumed_length
-                output += handle_problematic_characters(errors, filename, i, end_position,
-                                                        "open parenthesis was never closed")
-                i = end_position
-                continue
+    if plain_filename_pattern.match(filename):
+        return unicode(filename.translate(underscores_to_spaces)), input_length
+    # Like in `encode`, the input is scanned in runs by one regular expression,
+    # namely `decode_pattern`.
+    output = []
+    for match in decode_pattern.finditer(filename):
+        kind = match.lastgroup
+        start, end = match.span()
+        if kind == "plain":
+            output.append(match.group().translate(underscores_to_spaces))
+        elif kind == "braces":
+            if match.group().endswith("}"):
+                output.append(match.group()[1:-1].upper())
             else:
-                try:
-                    output += unichr(int(filename[i+1:end_position], 16))
-                except:
-                    output += handle_problematic_characters(errors, filename, i, end_position+1,
-                                                            "invalid data between parentheses")
-            i = end_position
+                output.append(match.group()[1:].upper())
+                if end == input_length:
+                    # In you want to implement StreamReaders: If the string
+                    # didn't start with this parentheses sequence, it should
+                    # return from here with a smaller value for consumed_length
+                    handle_problematic_characters(errors, filename, end-1, end,
+                                                  "open brace was never closed")
+                else:
+                    # The invalid character itself is treated by the next
+                    # match.
+                    handle_problematic_characters(
+                        errors, filename, end, end+1,
+                        "invalid character '%s' in braces sequence" % filename[end])
+        elif kind == "parentheses":
+            code = match.group()[1:-1]
+            character = decoded_characters.get(code)
+            if character is None:
+                if hex_code_pattern.match(code) and int(code, 16) <= sys.maxunicode:
+                    character = decoded_characters[code] = unichr(int(code, 16))
+                else:
+                    character = handle_problematic_characters(errors, filename, start, end,
+                                                              "invalid data between parentheses")
+            output.append(character)
+        elif kind == "unclosed":
+            # In you want to implement StreamReaders: If the string didn't
+            # start with this curly braces sequence, it should return from
+            # here with a smaller value for consumed_length
+            output.append(handle_problematic_characters(errors, filename, start, end,
+                                                     "open parenthesis was never closed"))
         else:
-            output += handle_problematic_characters(errors, filename, i, i+1,
-                                                    "invalid character '%s'" % char)
-        i += 1
-    return output, input_length
+            output.append(handle_problematic_characters(errors, filename, start, end,
+                                                     "invalid character '%s'" % match.group()))
+    return u"".join(output), input_length
+
+def encode_str(filename):
+    """Convert a Unicode string to a safe filename without going through the
+    codec machinery.  This is equivalent to ``filename.encode("safefilename")``
+    but faster for many short names.
+
+    :Parameters:
+      - `filename`: the input string to be converted into a safe filename
+
+    :type filename: unicode
+
+    :Return:
+      the safe filename
+
+    :rtype: str
+    """
+    return encode(filename)[0]
+
+def decode_str(filename, errors='strict'):
+    """Convert a safe filename to a Unicode string without going through the
+    codec machinery.  This is equivalent to
+    ``filename.decode("safefilename", errors)`` but faster for many short
+    names.
+
+    :Parameters:
+      - `filename`: the safe filename to be converted to an ordinary Unicode
+        string
+      - `errors`: the ``errors`` parameter known from standard ``str.decode``
+        methods
+
+    :type filename: str
+    :type errors: str
+
+    :Return:
+      the plain Unicode string
+
+    :rtype: unicode
+    """
+    return decode(filename, errors)[0]
+
+# The codec information is created once and returned by every lookup.  Stream
+# readers and writers are not implemented (and not needed).
+codec_info = codecs.CodecInfo(encode, decode, name="safefilename")
 
 def registry(encoding):
     """Lookup function for the ``safefilename`` encoding.
@@ -190,14 +274,13 @@ def registry(encoding):
     :type encoding: str
 
     :Return:
-      a tuple containing (encoder, decoder, streamencoder, streamdecoder).  The
-      latter two are set to ``None`` because they are not implemented (and not
-      needed).
+      the codec information for the encoding, or ``None`` if it is not
+      ``safefilename``
 
-    :rtype: tuple
+    :rtype: codecs.CodecInfo
     """
     if encoding == "safefilename":
-        return (encode, decode, None, None)
+        return codec_info
     else:
         return None
 
@@ -15,6 +15,26 @@ from bobcatlib.settings import settings
 
 settings["quiet"] = True
 
+def read_file(filename):
+    """Return the contents of the given file.  Unlike ``open(filename).read()``,
+    this closes the file immediately.
+
+    :Parameters:
+      - `filename`: the name of the file
+
+    :type filename: str
+
+    :Return:
+      the contents of the file
+
+    :rtype: str
+    """
+    file_ = open(filename, "rb")
+    try:
+        return file_.read()
+    finally:
+        file_.close()
+
 class TestSampleDocument(unittest.TestCase):
     """Test case for a sample document run through Bobcat.
     """
@@ -22,8 +42,8 @@ class TestSampleDocument(unittest.TestCase):
         """sample document should run through with expected output"""
         result = subprocess.call(["python", "../bobcat.py", "test1.bcat"])
         self.assertEqual(result, 0, "bobcat process aborted")
-        actual_output = open("test1.tex").read()
-        desired_output = open("test1-desired.tex").read()
+        actual_output = read_file("test1.tex")
+        desired_output = read_file("test1-desired.tex")
         self.assertEqual(actual_output, desired_output,
                          "result of sample document was not the expected result")
         os.remove("test1.tex")
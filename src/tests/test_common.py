@@ -9,8 +9,8 @@
 :type suite: ``unittext.TextSuite``
 """
 
-import unittest, doctest, os
-from bobcatlib import common, preprocessor, parser, settings
+import unittest
+from bobcatlib import common, preprocessor, parser
 
 suite = unittest.TestSuite()
 
@@ -49,10 +49,8 @@ class TestParseLocalVariables(unittest.TestCase):
 
 class TestAddParseError(unittest.TestCase):
     def setUp(self):
-        testfile = open("test.bcat", "w")
-        testfile.write(".. -*- coding: utf-8 -*-\n.. Bobcat 1.0\nDummy document.\n")
-        testfile.close()
-        text, __, __ = preprocessor.load_file("test.bcat")
+        text, __, __ = preprocessor.load_string(
+            ".. -*- coding: utf-8 -*-\n.. Bobcat 1.0\nDummy document.\n", "test.bcat")
         self.document = parser.Document()
         self.assertEqual(self.document.parse(text, 0), 18)
     def test_parse_error(self):
@@ -68,7 +66,6 @@ class TestAddParseError(unittest.TestCase):
         self.assertEqual(unicode(common.ParseError.parse_errors[0]),
                          u'file "test.bcat", line 1, column 24: test error message')
     def tearDown(self):
-        os.remove("test.bcat")
         del common.ParseError.parse_errors[:]
     def shortDescription(self):
         description = super(TestAddParseError, self).shortDescription()
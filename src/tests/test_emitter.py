@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import unittest, doctest
+import unittest
 from bobcatlib import emitter
 
 suite = unittest.TestSuite()
@@ -9,7 +9,7 @@
 :type suite: ``unittext.TextSuite``
 """
 
-import unittest, doctest, os
+import unittest, os
 from bobcatlib import helpers, parser, preprocessor
 
 suite = unittest.TestSuite()
@@ -55,9 +55,22 @@ class TestPrintTree(unittest.TestCase):
 
 class TestVisualizeTree(unittest.TestCase):
     """Test case for `helpers.visualize_tree`.
+
+    :cvar desired_result: the expected Graphviz output, read from the testbed
+      only once
+    :cvar document: the parsed sample document, shared by all test methods
+
+    :type desired_result: str
+    :type document: `parser.Document`
     """
-    def setUp(self):
-        open("test.bcat", "w").write(""".. -*- coding: utf-8 -*-
+    @classmethod
+    def setUpClass(cls):
+        desired_file = open("test-desired.canon")
+        try:
+            cls.desired_result = desired_file.read()
+        finally:
+            desired_file.close()
+        text, __, __ = preprocessor.load_string(""".. -*- coding: utf-8 -*-
 .. Bobcat 1.0
 
 #. Introduction
@@ -96,20 +109,20 @@ It was a long time before anyone spoke.
 This is almost the last paragraph.
 
 And this is _definitely the last one_.
-""")
-        text, __, __ = preprocessor.load_file("test.bcat")
-        self.document = parser.Document()
-        self.document.parse(text)
+""", "test.bcat")
+        cls.document = parser.Document()
+        cls.document.parse(text)
     def test(self):
         """the plot generated with Graphviz from a given parse tree should be as expected"""
         helpers.visualize_tree(self.document.tree_list(), "test.canon")
-        actual_result = open("test.canon").read()
-        desired_result = open("test-desired.canon").read()
-        self.assertEqual(actual_result, desired_result,
+        self.addCleanup(os.remove, "test.canon")
+        actual_file = open("test.canon")
+        try:
+            actual_result = actual_file.read()
+        finally:
+            actual_file.close()
+        self.assertEqual(actual_result, self.desired_result,
                          "Graphviz generated a plot which was different from the expected one")
-    def tearDown(self):
-        os.remove("test.bcat")
-        os.remove("test.canon")
     def shortDescription(self):
         description = super(TestVisualizeTree, self).shortDescription()
         return "helpers.visualize_tree: " + (description or "")
@@ -9,7 +9,7 @@
 :type suite: ``unittext.TextSuite``
 """
 
-import unittest, doctest, gettext, os
+import unittest, gettext
 from bobcatlib import i18n, preprocessor
 
 gettext._default_localedir = "locale"
@@ -20,7 +20,7 @@ class TestI18n(unittest.TestCase):
     def check_translation(self, text, language, desired_translation, strict=False):
         actual_translation = i18n.translate(text, language, strict)
         self.assertEqual(actual_translation, desired_translation)
-        self.assert_(isinstance(actual_translation, unicode))
+        self.assertIsInstance(actual_translation, unicode)
     def test_translate(self):
         """translation to arbitray languages should work"""
         self.check_translation(u"January", "de", u"Januar")
@@ -53,25 +53,21 @@ class TestTranslations(unittest.TestCase):
 
 class TestMatchLanguageDependently(unittest.TestCase):
     def setUp(self):
-        self.filename = "test.bcat"
-        open(self.filename, "w").write(
-            ".. -*- coding: utf-8 -*-\n.. Bobcat 1.0\n\nJanuar\n\\January\n")
-        self.text, __, __ = preprocessor.load_file(self.filename)
+        self.text, __, __ = preprocessor.load_string(
+            ".. -*- coding: utf-8 -*-\n.. Bobcat 1.0\n\nJanuar\n\\January\n", "test.bcat")
     def test_translated(self):
         """matching the translated version in the source should work"""
-        self.assert_(i18n.match_language_dependently(u"January", self.text, 3, "de"))
+        self.assertTrue(i18n.match_language_dependently(u"January", self.text, 3, "de"))
     def test_translated_escaped(self):
         """matching the translated, escaped version in the source should fail or work """ \
             """according to the "unescaped_only" option"""
-        self.assert_(not i18n.match_language_dependently(u"January", self.text, 10, "de"))
-        self.assert_(
+        self.assertFalse(i18n.match_language_dependently(u"January", self.text, 10, "de"))
+        self.assertTrue(
             i18n.match_language_dependently(u"January", self.text, 10, "de", unescaped_only=False))
     def test_without_mo_file(self):
         """matching the translated version in the source should fail if the target language """ \
             """doesn't have an ".mo" file"""
-        self.assert_(not i18n.match_language_dependently(u"January", self.text, 3, "de-de"))
-    def tearDown(self):
-        os.remove(self.filename)
+        self.assertFalse(i18n.match_language_dependently(u"January", self.text, 3, "de-de"))
     def shortDescription(self):
         description = super(TestMatchLanguageDependently, self).shortDescription()
         return "i18n.match_language_dependently: " + (description or "")
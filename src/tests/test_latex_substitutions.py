@@ -9,48 +9,61 @@
 :type suite: ``unittext.TextSuite``
 """
 
-import unittest, doctest
+import unittest
 from bobcatlib import latex_substitutions
 
 suite = unittest.TestSuite()
 
 class TestProcessTest(unittest.TestCase):
     """Test case for `latex_substitutions.process_text`."""
+    longMessage = True
+    def check_conversions(self, mode, conversions):
+        """Check the results of `latex_substitutions.process_text` for German
+        text in the given mode.
+
+        :Parameters:
+          - `mode`: the LaTeX context of the converted texts
+          - `conversions`: pairs of Unicode texts and the LaTeX code they
+            should be converted to
+
+        :type mode: str
+        :type conversions: list of (unicode, unicode)
+        """
+        for text, desired_result in conversions:
+            self.assertEqual(latex_substitutions.process_text(text, "de", mode), desired_result,
+                             "for %r in %s mode" % (text, mode))
     def test(self):
         """converting a Unicode codepoint to a LaTeX macro should work"""
-        self.assertEqual(latex_substitutions.process_text(u"→", "de", "TEXT"), ur"$\rightarrow${}")
-        self.assertEqual(latex_substitutions.process_text(u"€", "de", "TEXT"), ur"\texteuro{}")
+        self.check_conversions("TEXT", [(u"→", ur"$\rightarrow${}"),
+                                        (u"€", ur"\texteuro{}")])
     def test_math(self):
         """converting a Unicode codepoint to a LaTeX macro in math mode should work"""
-        self.assertEqual(latex_substitutions.process_text(u"a", "de", "MATH"), u"a")
-        self.assertEqual(latex_substitutions.process_text(u"→", "de", "MATH"), ur"\rightarrow ")
-        self.assertEqual(latex_substitutions.process_text(u"a→", "de", "MATH"), ur"a\rightarrow ")
-        self.assertEqual(
-            latex_substitutions.process_text(u"→→", "de", "MATH"), ur"\rightarrow \rightarrow ")
+        self.check_conversions("MATH", [(u"a", u"a"),
+                                        (u"→", ur"\rightarrow "),
+                                        (u"a→", ur"a\rightarrow "),
+                                        (u"→→", ur"\rightarrow \rightarrow ")])
     def test_math_trailing(self):
         """converting a Unicode codepoint to a LaTeX macro in math mode with trailing letter """ \
             """should generate a space between them"""
-        self.assertEqual(latex_substitutions.process_text(u"→x", "de", "MATH"), ur"\rightarrow x")
+        self.check_conversions("MATH", [(u"→x", ur"\rightarrow x")])
     def test_text_trailing(self):
         """converting a Unicode codepoint to a LaTeX macro in math mode with trailing sign """ \
             """should generate a space between them if and only if the following sign is a """ \
             """letter"""
-        self.assertEqual(
-            latex_substitutions.process_text(u"a€€a", "de", "TEXT"), ur"a\texteuro\texteuro a")
-        self.assertEqual(latex_substitutions.process_text(u"a € € a", "de", "TEXT"),
-                         ur"a \texteuro\ \texteuro\ a")
+        self.check_conversions("TEXT", [(u"a€€a", ur"a\texteuro\texteuro a"),
+                                        (u"a € € a", ur"a \texteuro\ \texteuro\ a")])
     def test_special_characters_text(self):
         """characters that have a special meaning in LaTeX should work in text mode"""
-        self.assertEqual(
-            latex_substitutions.process_text(u"!^°$%&{}\\`´?#~<>|'@"+'"', "de", "TEXT"),
-            ur"!{}\textasciicircum\textdegree\textdollar\%\&\{\}\textbackslash"
-            ur"`{}\textasciiacute?{}\#\textasciitilde<{}>{}|'{}@\char34{}")
+        self.check_conversions(
+            "TEXT", [(u"!^°$%&{}\\`´?#~<>|'@"+'"',
+                      ur"!{}\textasciicircum\textdegree\textdollar\%\&\{\}\textbackslash"
+                      ur"`{}\textasciiacute?{}\#\textasciitilde<{}>{}|'{}@\char34{}")])
     def test_special_characters_math(self):
         """characters that have a special meaning in LaTeX should work in math mode"""
-        self.assertEqual(
-            latex_substitutions.process_text(u"!^°$%&{}\\`´?#~<>|'@"+'"', "de", "MATH"),
-            ur"!{\char94}^\circ \$\%\&\{ \} \backslash \grave{\hspace*{0.5em}} "
-            ur"\acute{\hspace*{0.5em}} ?\#{\char126}<>|'@{\char34}")
+        self.check_conversions(
+            "MATH", [(u"!^°$%&{}\\`´?#~<>|'@"+'"',
+                      ur"!{\char94}^\circ \$\%\&\{ \} \backslash \grave{\hspace*{0.5em}} "
+                      ur"\acute{\hspace*{0.5em}} ?\#{\char126}<>|'@{\char34}")])
     def shortDescription(self):
         description = super(TestProcessTest, self).shortDescription()
         return "latex_substitutions.process_test: " + (description or "")
@@ -9,7 +9,7 @@
 :type suite: ``unittext.TextSuite``
 """
 
-import unittest, doctest, os
+import unittest, os, tempfile, shutil
 from bobcatlib import preprocessor
 from bobcatlib.common import PositionMarker
 
@@ -18,31 +18,30 @@ suite = unittest.TestSuite()
 class TestExcerpt(unittest.TestCase):
     """Abstract base class for all tests with `preprocessor.Excerpt`.
 
-    :cvar sample_text: The encoded text that should be written to the testbed
-      file.  Note that this is not a Unicode string but an octet string.  It
-      must be specified in derived classes.
-    :ivar text: the Bobcat source text that was read from the file
-    :ivar encoding: the detected encoding of the Bobcat file
-    :ivar bobcat_version: the detected Bobcat version of the Bobcat file
+    :cvar sample_text: The encoded contents of the Bobcat file ``test.bcat``
+      which are passed to `preprocessor.load_string` once in `setUpClass`.
+      Note that this is not a Unicode string but an octet string.  It must be
+      specified in derived classes.
+    :cvar text: the Bobcat source text that was loaded from `sample_text`.
+      It is shared by all test methods of the class, so they must not modify
+      it.
+    :cvar encoding: the detected encoding of `sample_text`
+    :cvar bobcat_version: the detected Bobcat version of `sample_text`
 
     :type sample_text: str
     :type text: `preprocessor.Excerpt`
     :type encoding: str
     :type bobcat_version: str"""
-    def setUp(self):
-        """Write a test Bobcat file to the testbed directory so that it can be
-        read immediately, in order to create a `preprocessor.Excerpt` instance,
-        and in order to be able to test the return values or
-        `preprocessor.load_file`."""
-        testfile = open("test.bcat", "w")
-        testfile.write(self.sample_text)
-        testfile.close()
-        self.text, self.encoding, self.bobcat_version = preprocessor.load_file("test.bcat")
-    def tearDown(self):
-        """Remove the test Bobcat file from the testbed."""
-        # Actually, this could also be removed already in `setUp` but here, I
-        # find it more logical.  And who knows: Maybe it must be re-read.
-        os.remove("test.bcat")
+    @classmethod
+    def setUpClass(cls):
+        """Process the sample text as if it was read from the Bobcat file
+        ``test.bcat``, in order to create a `preprocessor.Excerpt` instance,
+        and in order to be able to test the return values of
+        `preprocessor.load_string`.  No file is written to the testbed.  This
+        is done only once for all test methods because Excerpts are
+        immutable."""
+        cls.text, cls.encoding, cls.bobcat_version = \
+            preprocessor.load_string(cls.sample_text, "test.bcat")
 
 class TestExcerptSlicing(TestExcerpt):
     """Abstract base class for very basic tests with `preprocessor.Excerpt`:
@@ -79,13 +78,16 @@ kf\0x64;sjh[[K2005]]\\56;fd\ \ \ kj
         :type desired: dict mapping int to `common.PositionMarker`
         :type actual: dict mapping int to `common.PositionMarker`
         """
+        # The detailed comparison is only necessary for the error messages.
+        if desired == actual:
+            return
         for position, marker in desired.iteritems():
-            self.assert_(position in actual,
-                         "missing PositionMarker <pos. %d, %s>" % (position, marker))
+            self.assertIn(position, actual,
+                          "missing PositionMarker <pos. %d, %s>" % (position, marker))
             self.assertEqual(marker, actual[position])
         for position, marker in actual.iteritems():
-            self.assert_(position in desired,
-                         "spurious extra PositionMarker <pos. %d, %s>" % (position, marker))
+            self.assertIn(position, desired,
+                          "spurious extra PositionMarker <pos. %d, %s>" % (position, marker))
     def test_original_text(self):
         """preprocessor.Excerpts should store the correct original text"""
         self.assertEqual(self.text.original_text, self.sample_text)
@@ -95,6 +97,15 @@ kf\0x64;sjh[[K2005]]\\56;fd\ \ \ kj
     def test_escaped_positions(self):
         """preprocessor.Excerpts should find the correct escaped positions"""
         self.assertEqual(self.text.escaped_positions, self.escaped_positions)
+    def test_indexing_leaves_original_positions_alone(self):
+        """indexing a preprocessor.Excerpt should not change its position markers"""
+        indices = dict((position, marker.index)
+                       for position, marker in self.text.original_positions.iteritems())
+        for position in range(len(self.text)):
+            self.assertEqual(self.text[position].original_positions[0].index, 0)
+        self.assertEqual(dict((position, marker.index)
+                              for position, marker in self.text.original_positions.iteritems()),
+                         indices)
 
 class TestExcerptSlicingBeforePostprocessing(TestExcerptSlicing):
     """Test case class for basic tests with `preprocessor.Excerpt` *before*
@@ -123,9 +134,9 @@ class TestExcerptSlicingBeforePostprocessing(TestExcerptSlicing):
          39: PositionMarker("test.bcat", 9, 0, 118),
          40: PositionMarker("test.bcat", 9, 6, 124),
          41: PositionMarker("test.bcat", 10, 0, 125)}
-    escaped_positions = set([32, 6, 12, 18, 25, 29])
+    escaped_positions = {32, 6, 12, 18, 25, 29}
     def test_sourcecode_meta_data(self):
-        """bobcatlib.preprocessor.load_file should load Bobcat files correctly"""
+        """bobcatlib.preprocessor.load_string should load Bobcat files correctly"""
         self.assertEqual(self.text, u"\n\n\n\n\u03b2\nkfdsjh[K2005]\\56;fdkj\n \u03b1--\u03b1\n\u03b8var\n\u03b8\n")
         self.assertEqual(self.encoding, None)
         self.assertEqual(self.bobcat_version, "1.0")
@@ -141,6 +152,15 @@ class TestExcerptSlicingBeforePostprocessing(TestExcerptSlicing):
 class TestExcerptSlicingAfterPostprocessing(TestExcerptSlicing):
     """Test case class for basic tests with `preprocessor.Excerpt` *after*
     applying the post input method.
+
+    :cvar sliced_original_positions: the desired values for the original
+      positions in the slice tested in `test_slicing`
+    :cvar sliced_escaped_positions: the desired value for the escaped
+      positions in the slice tested in `test_slicing`
+
+    :type sliced_original_positions: dict mapping int to
+      `common.PositionMarker`
+    :type sliced_escaped_positions: set of int
     """
     original_positions = \
         {0: PositionMarker("test.bcat", 1, 24, 24),
@@ -164,29 +184,33 @@ class TestExcerptSlicingAfterPostprocessing(TestExcerptSlicing):
          29: PositionMarker("test.bcat", 7, 3, 91),
          30: PositionMarker("test.bcat", 7, 9, 97),
          31: PositionMarker("test.bcat", 7, 13, 101)}
-    escaped_positions = set([6, 12, 18, 25, 29, 31])
-    def setUp(self):
-        super(TestExcerptSlicingAfterPostprocessing, self).setUp()
-        self.text = self.text.apply_postprocessing()
+    escaped_positions = {6, 12, 18, 25, 29, 31}
+    sliced_original_positions = \
+        {0: PositionMarker("test.bcat", 5, 0, 0),
+         1: PositionMarker("test.bcat", 5, 6, 6),
+         2: PositionMarker("test.bcat", 6, 0, 7),
+         5: PositionMarker("test.bcat", 6, 8, 15),
+         9: PositionMarker("test.bcat", 6, 13, 20),
+         15: PositionMarker("test.bcat", 6, 20, 27),
+         16: PositionMarker("test.bcat", 6, 22, 29)}
+    sliced_escaped_positions = {8, 2, 14}
+    @classmethod
+    def setUpClass(cls):
+        super(TestExcerptSlicingAfterPostprocessing, cls).setUpClass()
+        cls.text = cls.text.apply_postprocessing()
     def test_slicing(self):
         """normal slicing and concatenating should work as with strings"""
-        sliced_original_positions = {0: PositionMarker("test.bcat", 5, 0, 0),
-                                     1: PositionMarker("test.bcat", 5, 6, 6),
-                                     2: PositionMarker("test.bcat", 6, 0, 7),
-                                     5: PositionMarker("test.bcat", 6, 8, 15),
-                                     9: PositionMarker("test.bcat", 6, 13, 20),
-                                     15: PositionMarker("test.bcat", 6, 20, 27),
-                                     16: PositionMarker("test.bcat", 6, 22, 29)}
-        sliced_escaped_positions = set([8, 2, 14])
         sliced_text = self.text[4:21]
         self.assertEqual(sliced_text, u"\u03b2\nkfdsjh[K2005]\\5")
-        self.compare_original_positions(sliced_original_positions, sliced_text.original_positions)
-        self.assertEqual(sliced_text.escaped_positions, sliced_escaped_positions)
+        self.compare_original_positions(self.sliced_original_positions,
+                                        sliced_text.original_positions)
+        self.assertEqual(sliced_text.escaped_positions, self.sliced_escaped_positions)
         sliced_text = sliced_text[:10] + sliced_text[10:]
         self.assertEqual(sliced_text, u"\u03b2\nkfdsjh[K2005]\\5")
         self.assertEqual(sliced_text.original_text, u"\\beta\\\nkf\\0x64;sjh[[K2005]]\\\\5")
-        self.compare_original_positions(sliced_original_positions, sliced_text.original_positions)
-        self.assertEqual(sliced_text.escaped_positions, sliced_escaped_positions)
+        self.compare_original_positions(self.sliced_original_positions,
+                                        sliced_text.original_positions)
+        self.assertEqual(sliced_text.escaped_positions, self.sliced_escaped_positions)
     def test_character_extraction(self):
         """normal indexing (no slices) should work as with strings"""
         character = self.text[10]
@@ -254,13 +278,24 @@ And here the file ends.
         part1, part2 = self.text[:34], self.text[34:]
         self.assertEqual(part1.code_snippets_intervals, [(31, 34)])
         self.assertEqual(part2.code_snippets_intervals, [(0, 4), (57, 66)])
-        self.assertEqual((part1+part2).code_snippets_intervals, [(31, 34), (34, 38), (91, 100)])
+        self.assertEqual((part1+part2).code_snippets_intervals, [(31, 38), (91, 100)])
+    def test_slicing_within_last_snippet(self):
+        """the last code snippet interval of a slice starting after the beginning should """ \
+            """end at the end of the slice"""
+        sliced_text = self.text[34:95]
+        self.assertEqual(sliced_text.code_snippets_intervals, [(0, 4), (57, 61)])
+        self.assertEqual(len(sliced_text.escaped_text()), len(sliced_text))
+    def test_postprocessing(self):
+        """code snippets should survive the post input method unchanged"""
+        postprocessed_text = self.text.apply_postprocessing()
+        self.assertEqual(postprocessed_text, self.text)
+        self.assertEqual(postprocessed_text.code_snippets_intervals, [(31, 38), (91, 100)])
     def test_escaped_text(self):
         """code snippets should be treated as escaped text"""
         self.assertEqual(self.text.escaped_text(),
-                         u"\n\n\n\nThis is a code snippet: ```\x00\x00\x00\x00\x00\x00\x00```.  "
-                         u"And this is one in a paragraph of its\nown:\n\n```"
-                         u"\x00\x00\x00\x00\x00\x00\x00\x00\x00```\n\nAnd here the file ends.\n")
+                         u"\n\n\n\nThis is a code snippet: ```" + 7 * u"\x00" + u"```.  "
+                         u"And this is one in a paragraph of its\nown:\n\n```" +
+                         9 * u"\x00" + u"```\n\nAnd here the file ends.\n")
         self.assertEqual(len(self.text.escaped_text()), len(self.text))
 
 class TestExcerptCodeSnippetsIntervalsOpenEnding(TestExcerpt):
@@ -277,6 +312,61 @@ This is a code snippet with open ending: ```GOTO 10
         """upper bound of open-ending code snippet should be the end of the preprocessor.Excerpt"""
         self.assertEqual(len(self.text), self.text.code_snippets_intervals[0][1])
 
+class TestLoadFile(unittest.TestCase):
+    """Test case for `preprocessor.load_file`.
+    """
+    sample_text = ".. -*- coding: utf-8 -*-\n.. Bobcat 1.0\n\n\\alpha -- \xc3\xa4\n"
+    def setUp(self):
+        """Write a test Bobcat file to the temporary directory.  It is removed
+        after the test."""
+        testfile = tempfile.NamedTemporaryFile(suffix=".bcat", delete=False)
+        testfile.write(self.sample_text)
+        testfile.close()
+        self.filename = testfile.name
+        self.addCleanup(os.remove, self.filename)
+    def test_load_file(self):
+        """bobcatlib.preprocessor.load_file should give the same as load_string"""
+        text, encoding, bobcat_version = preprocessor.load_file(self.filename)
+        desired_text, desired_encoding, desired_bobcat_version = \
+            preprocessor.load_string(self.sample_text, self.filename)
+        self.assertEqual(text, desired_text)
+        self.assertEqual(text.original_positions, desired_text.original_positions)
+        self.assertEqual((encoding, bobcat_version), (desired_encoding, desired_bobcat_version))
+
+class TestExcerptTrailingBackslash(unittest.TestCase):
+    """Test case for a backslash at the very end of the text, where there is
+    nothing left to escape.
+    """
+    def test_alone(self):
+        """a trailing backslash should be dropped"""
+        excerpt = preprocessor.process_text(u"foo\\", "test.bcat", "minimal")
+        self.assertEqual(excerpt, u"foo")
+        self.assertEqual(excerpt.escaped_positions, set())
+        self.assertEqual(excerpt.original_position(3), PositionMarker("test.bcat", 1, 4, 4))
+        self.assertEqual(preprocessor.process_text(u"\\", "test.bcat", "minimal"), u"")
+    def test_after_match(self):
+        """a trailing backslash right after an input method match should be dropped"""
+        excerpt = preprocessor.process_text(u"\\alpha\\", "test.bcat", "minimal")
+        self.assertEqual(excerpt, u"\u03b1")
+        self.assertEqual(excerpt.escaped_positions, set())
+        self.assertEqual(preprocessor.process_text(u"a...\\", "test.bcat", "minimal"),
+                         u"a\u2026")
+
+class TestExcerptWithoutPostInputMethod(unittest.TestCase):
+    """Test case for `preprocessor.Excerpt.apply_postprocessing` with an empty
+    post input method.
+    """
+    def test_postprocessing(self):
+        """without post input method, postprocessing should leave the """ \
+            """preprocessor.Excerpt unchanged"""
+        excerpt = preprocessor.Excerpt(u"a -- \\b ```c -- d``` e\n", "PRE", "test.bcat", [], [])
+        postprocessed_excerpt = excerpt.apply_postprocessing()
+        self.assertEqual(postprocessed_excerpt, u"a -- b ```c -- d``` e\n")
+        self.assertEqual(postprocessed_excerpt.escaped_positions, {5})
+        self.assertEqual(postprocessed_excerpt.code_snippets_intervals, [(10, 16)])
+        self.assertEqual(postprocessed_excerpt.original_position(6),
+                         PositionMarker("test.bcat", 1, 7, 7))
+
 class TestExcerptNormalizeWhitespace(unittest.TestCase):
     """Test case for `preprocessor.Excerpt.normalize_whitespace`.
     """
@@ -292,10 +382,69 @@ class TestExcerptNormalizeWhitespace(unittest.TestCase):
         self.assertEqual(empty_excerpt, u"")
         self.assertEqual(empty_excerpt.original_position(0), PositionMarker("test.bcat", 1, 0, 0))
 
+class TestReadInputMethod(unittest.TestCase):
+    """Test case for `preprocessor.read_input_method`.
+    """
+    def test_minimal(self):
+        """the "minimal" input method should be read with all its substitutions"""
+        pre_substitutions, post_substitutions = preprocessor.read_input_method("minimal")
+        self.assertEqual(len(pre_substitutions), 12)
+        self.assertEqual(pre_substitutions[0], (u"^--(?= )", u"\u2013"))
+        self.assertEqual(pre_substitutions[4], (u"\\\\alpha", u"\u03b1"))
+        self.assertEqual(pre_substitutions[1], (u"\\.\\.\\.", u"\u2026"))
+        self.assertEqual(post_substitutions, [(u"--", u"\u2013"), (u"---", u"\u2014")])
+    def test_none(self):
+        """the "none" input method should yield no substitutions at all"""
+        self.assertEqual(preprocessor.read_input_method("none"), ([], []))
+
+class TestReadInputMethodInheritance(unittest.TestCase):
+    """Test case for parental input methods in `preprocessor.read_input_method`.
+
+    :cvar input_methods: the input method files that are written to the
+      testbed directory, mapping the names of the input methods to the names
+      of their parents.
+
+    :type input_methods: dict mapping str to list of str
+    """
+    input_methods = {"testchild": ["testleft", "testright"], "testleft": ["testbase"],
+                     "testright": ["testbase"], "testbase": [],
+                     "testcycle": ["testloop"], "testloop": ["testcycle"]}
+    def setUp(self):
+        """Write the test input methods to a temporary directory and let
+        `preprocessor` look for input methods there.  Both are undone after the
+        test."""
+        self.input_methods_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.input_methods_path)
+        for name, parents in self.input_methods.iteritems():
+            header = ".. -*- input-method-name: %s" % name
+            if parents:
+                header += "; parental-input-method: " + ",".join(parents)
+            input_method_file = open(os.path.join(self.input_methods_path, name + ".bim"), "w")
+            input_method_file.write(header + " -*-\n.. Bobcat input method\n\n%s\t\t%s\n" %
+                                    (name, name[4]))
+            input_method_file.close()
+        self.addCleanup(setattr, preprocessor, "input_methods_path",
+                        preprocessor.input_methods_path)
+        preprocessor.input_methods_path = self.input_methods_path
+    def test_parents(self):
+        """input methods inherited several times should be read only once"""
+        pre_substitutions, post_substitutions = preprocessor.read_input_method("testchild")
+        self.assertEqual(pre_substitutions, [(u"testleft", u"l"), (u"testbase", u"b"),
+                                             (u"testright", u"r"), (u"testchild", u"c")])
+        self.assertEqual(post_substitutions, [])
+    def test_cycle(self):
+        """an input method which is its own parent should be rejected"""
+        self.assertRaises(preprocessor.FileError, preprocessor.read_input_method, "testcycle")
+
 for test_class in (TestExcerptSlicingBeforePostprocessing,
                    TestExcerptSlicingAfterPostprocessing,
                    TestExcerptSplit,
                    TestExcerptCodeSnippetsIntervals,
                    TestExcerptCodeSnippetsIntervalsOpenEnding,
-                   TestExcerptNormalizeWhitespace):
+                   TestLoadFile,
+                   TestExcerptTrailingBackslash,
+                   TestExcerptWithoutPostInputMethod,
+                   TestExcerptNormalizeWhitespace,
+                   TestReadInputMethod,
+                   TestReadInputMethodInheritance):
     suite.addTests(unittest.defaultTestLoader.loadTestsFromTestCase(test_class))
@@ -9,7 +9,7 @@
 :type suite: ``unittext.TextSuite``
 """
 
-import unittest, doctest
+import unittest
 from bobcatlib import safefilename
 
 suite = unittest.TestSuite()
@@ -19,19 +19,24 @@ class TestEncoding(unittest.TestCase):
     """
     def test_simple(self):
         """encoding a name with only ASCII letters should work"""
-        encoded_name = u"hallo".encode("safefilename")
+        encoded_name = safefilename.encode_str(u"hallo")
         self.assertEqual(encoded_name, "hallo")
-        self.assert_(isinstance(encoded_name, str))
+        self.assertIsInstance(encoded_name, str)
     def test_uppercase(self):
         """encoding a name with uppercase letter should work"""
-        self.assertEqual(u"Hallo".encode("safefilename"), "{h}allo")
+        self.assertEqual(safefilename.encode_str(u"Hallo"), "{h}allo")
     def test_spaces(self):
         """encoding a name with spaces should work"""
-        self.assertEqual(u"MIT Thesis".encode("safefilename"), "{mit}_{t}hesis")
+        self.assertEqual(safefilename.encode_str(u"MIT Thesis"), "{mit}_{t}hesis")
     def test_umlauts(self):
         """encoding a name with umlauts and non-Latin-1 characters should work"""
-        self.assertEqual(u"Geschäftsbrief".encode("safefilename"), "{g}esch(e4)ftsbrief")
-        self.assertEqual(u"Geschαftsbrief".encode("safefilename"), "{g}esch(3b1)ftsbrief")
+        self.assertEqual(safefilename.encode_str(u"Geschäftsbrief"), "{g}esch(e4)ftsbrief")
+        self.assertEqual(safefilename.encode_str(u"Geschαftsbrief"), "{g}esch(3b1)ftsbrief")
+    def test_codec(self):
+        """encoding via the registered "safefilename" codec should work"""
+        encoded_name = u"MIT Geschäftsbrief".encode("safefilename")
+        self.assertEqual(encoded_name, "{mit}_{g}esch(e4)ftsbrief")
+        self.assertIsInstance(encoded_name, str)
     def shortDescription(self):
         description = super(TestEncoding, self).shortDescription()
         return "safefilename.encode: " + (description or "")
@@ -41,44 +46,53 @@ class TestDecoding(unittest.TestCase):
     """
     def test_umlauts(self):
         """decoding a filename with encoded umlauts and non-Latin-1 characters should work"""
-        result = "{g}esch(e4)ftsbrief".decode("safefilename")
+        result = safefilename.decode_str("{g}esch(e4)ftsbrief")
         self.assertEqual(result, u"Geschäftsbrief")
-        self.assert_(isinstance(result, unicode))
-        self.assertEqual(u"{g}esch(3b1)ftsbrief".decode("safefilename"), u"Geschαftsbrief")
+        self.assertIsInstance(result, unicode)
+        self.assertEqual(safefilename.decode_str("{g}esch(3b1)ftsbrief"), u"Geschαftsbrief")
     def test_uppercase_and_spaces(self):
         """decoding a filename with encoded uppercase letters and spaces should work"""
-        self.assertEqual(u"{mit}_{t}hesis".decode("safefilename"), u"MIT Thesis")
+        self.assertEqual(safefilename.decode_str("{mit}_{t}hesis"), u"MIT Thesis")
     def test_unclosed_brace(self):
         """decoding a filename with an unclosed curly brace should fail"""
-        self.assertRaises(UnicodeDecodeError, lambda: "{a".decode("safefilename"))
+        self.assertRaises(UnicodeDecodeError, lambda: safefilename.decode_str("{a"))
     def test_unmatched_parenthesis(self):
         """decoding a filename with an unmatched parenthesis should fail"""
-        self.assertRaises(UnicodeDecodeError, lambda: "1(5g2".decode("safefilename"))
+        self.assertRaises(UnicodeDecodeError, lambda: safefilename.decode_str("1(5g2"))
     def test_parentheses_with_invalid_code(self):
         """decoding a filename with parentheses containing invalid code should fail"""
-        self.assertRaises(UnicodeDecodeError, lambda: "1(5g)2".decode("safefilename"))
+        self.assertRaises(UnicodeDecodeError, lambda: safefilename.decode_str("1(5g)2"))
+        self.assertRaises(UnicodeDecodeError, lambda: safefilename.decode_str("1(0x41)2"))
+        self.assertRaises(UnicodeDecodeError, lambda: safefilename.decode_str("1(110000)2"))
     def test_uppercase_within_braces(self):
         """decoding a filename with an uppercase letter in curly braces should fail"""
-        self.assertRaises(UnicodeDecodeError, lambda: "{H}allo".decode("safefilename"))
+        self.assertRaises(UnicodeDecodeError, lambda: safefilename.decode_str("{H}allo"))
     def test_invalid_character(self):
         """decoding a filename with an invalid character should fail"""
-        self.assertRaises(UnicodeDecodeError, lambda: "}allo".decode("safefilename"))
-        self.assertRaises(UnicodeDecodeError, lambda: ")allo".decode("safefilename"))
-        self.assertRaises(UnicodeDecodeError, lambda: chr(170)+"allo".decode("safefilename"))
+        self.assertRaises(UnicodeDecodeError, lambda: safefilename.decode_str("}allo"))
+        self.assertRaises(UnicodeDecodeError, lambda: safefilename.decode_str(")allo"))
+        self.assertRaises(UnicodeDecodeError, lambda: safefilename.decode_str(chr(170) + "allo"))
     def test_errors_replace(self):
         """decoding a filename with errors="replace" should work"""
-        self.assertEqual(u"{H}allo".decode("safefilename", "replace"), u"??allo")
-        self.assertEqual(u"{".decode("safefilename", "replace"), u"")
-        self.assertEqual(u"{Aallo".decode("safefilename", "replace"), u"?allo")
-        self.assertEqual(u"1(rt)2".decode("safefilename", "replace"), u"1?2")
-        self.assertEqual(u"1(rt2".decode("safefilename", "replace"), u"1?rt2")
+        self.assertEqual(safefilename.decode_str("{H}allo", "replace"), u"??allo")
+        self.assertEqual(safefilename.decode_str("{", "replace"), u"")
+        self.assertEqual(safefilename.decode_str("{Aallo", "replace"), u"?allo")
+        self.assertEqual(safefilename.decode_str("1(rt)2", "replace"), u"1?2")
+        self.assertEqual(safefilename.decode_str("1(rt2", "replace"), u"1?rt2")
     def test_errors_ignore(self):
         """decoding a filename with errors="ignore" should work"""
-        self.assertEqual(u"{H}allo".decode("safefilename", "ignore"), u"allo")
-        self.assertEqual(u"{allo".decode("safefilename", "ignore"), u"ALLO")
-        self.assertEqual(u"{Aallo".decode("safefilename", "ignore"), u"allo")
-        self.assertEqual(u"1(rt)2".decode("safefilename", "ignore"), u"12")
-        self.assertEqual(u"1(rt2".decode("safefilename", "ignore"), u"1rt2")
+        self.assertEqual(safefilename.decode_str("{H}allo", "ignore"), u"allo")
+        self.assertEqual(safefilename.decode_str("{allo", "ignore"), u"ALLO")
+        self.assertEqual(safefilename.decode_str("{Aallo", "ignore"), u"allo")
+        self.assertEqual(safefilename.decode_str("1(rt)2", "ignore"), u"12")
+        self.assertEqual(safefilename.decode_str("1(rt2", "ignore"), u"1rt2")
+    def test_codec(self):
+        """decoding via the registered "safefilename" codec should work"""
+        result = "{mit}_{g}esch(e4)ftsbrief".decode("safefilename")
+        self.assertEqual(result, u"MIT Geschäftsbrief")
+        self.assertIsInstance(result, unicode)
+        self.assertEqual("{H}allo".decode("safefilename", "replace"), u"??allo")
+        self.assertRaises(UnicodeDecodeError, lambda: "{a".decode("safefilename"))
     def shortDescription(self):
         description = super(TestDecoding, self).shortDescription()
         return "safefilename.decode: " + (description or "")
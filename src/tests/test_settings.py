@@ -9,7 +9,7 @@
 :type suite: ``unittext.TextSuite``
 """
 
-import unittest, doctest, os, warnings
+import unittest, os, warnings
 from bobcatlib import settings, common
 
 common.setup_logging()
@@ -247,7 +247,7 @@ class TestAdjustValueToTypeFloat(unittest.TestCase):
             self.setting.value = 2
             self.setting.adjust_value_to_type(source)
             self.assertEqual(self.setting.value, 2.0)
-            self.assert_(isinstance(self.setting.value, float))
+            self.assertIsInstance(self.setting.value, float)
 # The following is a spurious test, see above
     def test_adjust_bool_direct_default(self):
         """with source direct/default, trying to adjust a bool to float should convert to """ \
@@ -256,7 +256,7 @@ class TestAdjustValueToTypeFloat(unittest.TestCase):
             self.setting.value = True
             self.setting.adjust_value_to_type(source)
             self.assertEqual(self.setting.value, 1.0)
-            self.assert_(isinstance(self.setting.value, float))
+            self.assertIsInstance(self.setting.value, float)
 # The following is a spurious test, see above
     def test_adjust_list_direct_default(self):
         """with source direct/default, trying to adjust a list of float to float should """ \
@@ -284,7 +284,7 @@ class TestAdjustValueToTypeFloat(unittest.TestCase):
         self.setting.value = u"2"
         self.setting.adjust_value_to_type("conf file")
         self.assertEqual(self.setting.value, 2.0)
-        self.assert_(isinstance(self.setting.value, float))
+        self.assertIsInstance(self.setting.value, float)
     def test_adjust_bool_conffile(self):
         """with source conf file, trying to adjust a bool to float should fail"""
         self.setting.value = u"true"
@@ -319,13 +319,13 @@ class TestAdjustValueToTypeFloat(unittest.TestCase):
         self.setting.value = u"2.1"
         self.setting.adjust_value_to_type("keyval list")
         self.assertEqual(self.setting.value, 2.1)
-        self.assert_(isinstance(self.setting.value, float))
+        self.assertIsInstance(self.setting.value, float)
     def test_adjust_int_keyval(self):
         """with source keyval list, trying to adjust an int to float should convert to float"""
         self.setting.value = u"2"
         self.setting.adjust_value_to_type("keyval list")
         self.assertEqual(self.setting.value, 2.0)
-        self.assert_(isinstance(self.setting.value, float))
+        self.assertIsInstance(self.setting.value, float)
     def test_adjust_bool_keyval(self):
         """with source keyval list, trying to adjust a bool to float should fail"""
         self.setting.value = u"true"
@@ -468,7 +468,7 @@ class TestAdjustValueToTypeUnicode(unittest.TestCase):
             self.setting.value = 2.1
             self.setting.adjust_value_to_type(source)
             self.assertEqual(self.setting.value, u"2.1")
-            self.assert_(isinstance(self.setting.value, unicode))
+            self.assertIsInstance(self.setting.value, unicode)
 # The following is a spurious test, see above
     def test_adjust_int_direct_default(self):
         """with source direct/default, trying to adjust an int to string should convert to """ \
@@ -477,7 +477,7 @@ class TestAdjustValueToTypeUnicode(unittest.TestCase):
             self.setting.value = 2
             self.setting.adjust_value_to_type(source)
             self.assertEqual(self.setting.value, u"2")
-            self.assert_(isinstance(self.setting.value, unicode))
+            self.assertIsInstance(self.setting.value, unicode)
 # The following is a spurious test, see above
     def test_adjust_bool_direct_default(self):
         """with source direct/default, trying to adjust a bool to string should convert to """ \
@@ -486,7 +486,7 @@ class TestAdjustValueToTypeUnicode(unittest.TestCase):
             self.setting.value = True
             self.setting.adjust_value_to_type(source)
             self.assertEqual(self.setting.value, u"True")
-            self.assert_(isinstance(self.setting.value, unicode))
+            self.assertIsInstance(self.setting.value, unicode)
 # The following is a spurious test, see above
     def test_adjust_list_direct_default(self):
         """with source direct/default, trying to adjust a list of float to string should """ \
@@ -502,25 +502,25 @@ class TestAdjustValueToTypeUnicode(unittest.TestCase):
         self.setting.value = u"hello"
         self.setting.adjust_value_to_type("conf file")
         self.assertEqual(self.setting.value, u"hello")
-        self.assert_(isinstance(self.setting.value, unicode))
+        self.assertIsInstance(self.setting.value, unicode)
     def test_adjust_float_conffile(self):
         """with source conf file, trying to adjust a float to string should convert to string"""
         self.setting.value = u"2.1"
         self.setting.adjust_value_to_type("conf file")
         self.assertEqual(self.setting.value, u"2.1")
-        self.assert_(isinstance(self.setting.value, unicode))
+        self.assertIsInstance(self.setting.value, unicode)
     def test_adjust_int_conffile(self):
         """with source conf file, trying to adjust an int to string should convert to string"""
         self.setting.value = u"2"
         self.setting.adjust_value_to_type("conf file")
         self.assertEqual(self.setting.value, u"2")
-        self.assert_(isinstance(self.setting.value, unicode))
+        self.assertIsInstance(self.setting.value, unicode)
     def test_adjust_bool_conffile(self):
         """with source conf file, trying to adjust a bool to string should convert to string"""
         self.setting.value = u"true"
         self.setting.adjust_value_to_type("conf file")
         self.assertEqual(self.setting.value, u"true")
-        self.assert_(isinstance(self.setting.value, unicode))
+        self.assertIsInstance(self.setting.value, unicode)
     def test_adjust_list_conffile(self):
         """with source conf file, trying to adjust a list of int to string should convert """ \
             """to list of string"""
@@ -528,7 +528,7 @@ class TestAdjustValueToTypeUnicode(unittest.TestCase):
         self.setting.adjust_value_to_type("conf file")
         self.assertEqual(self.setting.value, [u"1", u"4", u"6"])
         for element in self.setting.value:
-            self.assert_(isinstance(element, unicode))
+            self.assertIsInstance(element, unicode)
     def test_adjust_list_float_conffile(self):
         """with source conf file, trying to adjust a list of float to string should convert """ \
             """to a list of string"""
@@ -536,7 +536,7 @@ class TestAdjustValueToTypeUnicode(unittest.TestCase):
         self.setting.adjust_value_to_type("conf file")
         self.assertEqual(self.setting.value, ["1.2", u"4.4", u"6.3"])
         for element in self.setting.value:
-            self.assert_(isinstance(element, unicode))
+            self.assertIsInstance(element, unicode)
     def test_adjust_list_mixed_conffile(self):
         """with source conf file, trying to adjust a list of mixed values to string """\
             """should convert to list of string"""
@@ -544,7 +544,7 @@ class TestAdjustValueToTypeUnicode(unittest.TestCase):
         self.setting.adjust_value_to_type("conf file")
         self.assertEqual(self.setting.value, [u"1", u"4", u"6"])
         for element in self.setting.value:
-            self.assert_(isinstance(element, unicode))
+            self.assertIsInstance(element, unicode)
 
     def test_adjust_string_keyval(self):
         """with source keyval list, trying to adjust a string to string type should """ \
@@ -552,31 +552,31 @@ class TestAdjustValueToTypeUnicode(unittest.TestCase):
         self.setting.value = u"hello"
         self.setting.adjust_value_to_type("keyval list")
         self.assertEqual(self.setting.value, u"hello")
-        self.assert_(isinstance(self.setting.value, unicode))
+        self.assertIsInstance(self.setting.value, unicode)
     def test_adjust_float_keyval(self):
         """with source keyval list, trying to adjust a float to string should convert to string"""
         self.setting.value = u"2.1"
         self.setting.adjust_value_to_type("keyval list")
         self.assertEqual(self.setting.value, u"2.1")
-        self.assert_(isinstance(self.setting.value, unicode))
+        self.assertIsInstance(self.setting.value, unicode)
     def test_adjust_int_keyval(self):
         """with source keyval list, trying to adjust an int to string should convert to string"""
         self.setting.value = u"2"
         self.setting.adjust_value_to_type("keyval list")
         self.assertEqual(self.setting.value, u"2")
-        self.assert_(isinstance(self.setting.value, unicode))
+        self.assertIsInstance(self.setting.value, unicode)
     def test_adjust_bool_keyval(self):
         """with source keyval list, trying to adjust a bool to string should convert to string"""
         self.setting.value = u"true"
         self.setting.adjust_value_to_type("keyval list")
         self.assertEqual(self.setting.value, u"true")
-        self.assert_(isinstance(self.setting.value, unicode))
+        self.assertIsInstance(self.setting.value, unicode)
     def test_adjust_list_keyval(self):
         """with source keyval list, trying to convert lists should convert to string"""
         self.setting.value = u"(1.0, 4.2, 6.1)"
         self.setting.adjust_value_to_type("keyval list")
         self.assertEqual(self.setting.value, u"(1.0, 4.2, 6.1)")
-        self.assert_(isinstance(self.setting.value, unicode))
+        self.assertIsInstance(self.setting.value, unicode)
 
     def shortDescription(self):
         description = super(TestAdjustValueToTypeUnicode, self).shortDescription()
@@ -638,7 +638,7 @@ class TestSetValueDefaultFirst(unittest.TestCase):
         """
         setting.set_value(value, source)
         self.assertEqual(setting.value, desired_value if desired_value is not None else value)
-        self.assert_(isinstance(setting.value, type_))
+        self.assertIsInstance(setting.value, type_)
 
     def test_double_default(self):
         """setting a default twice for a setting should fail"""
@@ -843,7 +843,7 @@ class TestSetValueDefaultSecondDirect(unittest.TestCase):
         old_value = setting.value
         setting.set_value(value, "default")
         self.assertEqual(setting.value, desired_value if desired_value is not None else old_value)
-        self.assert_(isinstance(setting.value, type_))
+        self.assertIsInstance(setting.value, type_)
     def test_string(self):
         """setting a string default should work or fail depending of previous type"""
         self.assume_working_value_setting(self.string_setting, u"3", unicode)
@@ -980,7 +980,7 @@ class TestSetValueMisc(unittest.TestCase):
         setting.set_value(u"3", "keyval list")
         setting.set_value(u"3")
         self.assertEqual(setting.value, u"3")
-        self.assert_(isinstance(setting.value, unicode))
+        self.assertIsInstance(setting.value, unicode)
     def shortDescription(self):
         description = super(TestSetValueMisc, self).shortDescription()
         return "settings.Setting.set_value: " + (description or "")
@@ -1006,7 +1006,7 @@ class TestSettingInit(unittest.TestCase):
         """
         setting = settings.Setting(u"key", value, source=source)
         self.assertEqual(setting.value, desired_value if desired_value is not None else value)
-        self.assert_(isinstance(setting.value, type_))
+        self.assertIsInstance(setting.value, type_)
     def test_auto_detection_int(self):
         """int values should be properly auto-detected"""
         self.assume_working_instantiation(1, int)
@@ -1094,7 +1094,7 @@ class TestSettingInitExplicitType(unittest.TestCase):
         self.assertRaises(ValueError, lambda: settings.Setting(u"key", "un", "float"))
         setting = settings.Setting(u"key", 1, "float")
         self.assertEqual(setting.value, 1.0)
-        self.assert_(isinstance(setting.value, float))
+        self.assertIsInstance(setting.value, float)
         setting = settings.Setting(u"key", True, "float")
         self.assertEqual(setting.value, 1.0)
         self.assertRaises(ValueError, lambda: settings.Setting(u"key", u"no", "float"))
@@ -1225,7 +1225,7 @@ class TestSettingsDictParseKeyvalueList(unittest.TestCase):
     def test_parsing(self):
         """parsing of a key/value list should work"""
         self.assertEqual(self.settings, {u"a": u"b", u"c": 4, u"d": True})
-        self.assert_(isinstance(self.settings[u"c"], int))
+        self.assertIsInstance(self.settings[u"c"], int)
         self.assertEqual([key.original_position() for key in self.settings.iterkeys()],
                          [common.PositionMarker("myfile.rsl", 1, 0, 0),
                           common.PositionMarker("myfile.rsl", 1, 5, 0),